@@ -4,15 +4,19 @@
 # =============================================================================
 # IMPORTS AND SETUP
 # =============================================================================
-from agents import Agent, WebSearchTool, trace, Runner, gen_trace_id, function_tool
+from agents import Agent, WebSearchTool, trace, Runner, gen_trace_id, function_tool, RunContextWrapper
 from agents.model_settings import ModelSettings
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import asyncio
-import sendgrid
-import os
-from sendgrid.helpers.mail import Mail, Email, To, Content
-from typing import Dict, List, Optional
+from email_delivery import email_delivery, parse_recipients, Recipient
+from llm_gateway import get_gateway
+from research_checkpoint import ResearchCheckpoint, CheckpointConfig
+from research_scoring import extract_sources, score_results, filter_relevant
+from report_streaming import (ReportStreamParser, ProgressiveReportFile, ReportStreamConfig,
+                              log_report_field, FIELD, PARTIAL)
+from openai.types.responses import ResponseTextDeltaEvent
+from typing import Any, Callable, Dict, List, Optional
 from IPython.display import display, Markdown
 from datetime import datetime
 import logging
@@ -22,6 +26,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv(override=True)
+get_gateway().install_agents_sdk()  # Runner calls share the gateway's pool, rate limiter and cassette
 
 # =============================================================================
 # ENHANCED PYDANTIC MODELS
@@ -40,17 +45,23 @@ class SearchResult(BaseModel):
     summary: str = Field(description="Summary of search results")
     sources_count: int = Field(description="Number of sources found")
     relevance_score: float = Field(description="Relevance score (0-1)")
+    sources: List[str] = Field(default_factory=list, description="URLs cited in the summary")
 
 class ReportData(BaseModel):
     title: str = Field(description="Report title")
     executive_summary: str = Field(description="Executive summary (2-3 sentences)")
-    detailed_report: str = Field(description="The detailed report in markdown format")
+    # Structured output follows this order, so key findings stream before the long detailed report
     key_findings: List[str] = Field(description="List of key findings")
+    detailed_report: str = Field(description="The detailed report in markdown format")
     recommendations: List[str] = Field(description="Actionable recommendations")
     follow_up_questions: List[str] = Field(description="Suggested topics to research further")
     sources: List[str] = Field(description="List of sources used")
     generated_at: str = Field(description="Timestamp when report was generated")
 
+class EmailRunContext(BaseModel):
+    recipients: List[Recipient] = Field(description="Who the report goes to; set by the workflow, not the agent")
+    delivery: Optional[Dict[str, str]] = Field(default=None, description="Result of the last send_research_email call")
+
 # =============================================================================
 # ENHANCED SEARCH AGENT
 # =============================================================================
@@ -113,28 +124,15 @@ planner_agent = Agent(
 # ENHANCED EMAIL FUNCTION TOOL
 # =============================================================================
 @function_tool
-def send_research_email(subject: str, html_body: str, recipient_email: str = None) -> Dict[str, str]:
-    """ Send a formatted research report via email """
+async def send_research_email(ctx: RunContextWrapper[EmailRunContext], subject: str, html_body: str) -> Dict[str, str]:
+    """ Send a formatted research report via email to the run's recipients """
     try:
-        sg = sendgrid.SendGridAPIClient(api_key=os.environ.get('SENDGRID_API_KEY'))
-        
-        # Use environment variables or defaults
-        from_email = Email(os.environ.get('FROM_EMAIL', 'research@example.com'))
-        to_email = To(recipient_email or os.environ.get('TO_EMAIL', 'recipient@example.com'))
-        
-        content = Content("text/html", html_body)
-        mail = Mail(from_email, to_email, subject, content)
-        
-        response = sg.client.mail.send.post(request_body=mail.get())
-        
-        if response.status_code in [200, 201, 202]:
-            return {"status": "success", "message": "Email sent successfully"}
-        else:
-            return {"status": "error", "message": f"Email failed with status {response.status_code}"}
-            
+        result = await email_delivery.send(subject, html_body, ctx.context.recipients)
     except Exception as e:
         logger.error(f"Email sending failed: {str(e)}")
-        return {"status": "error", "message": str(e)}
+        result = {"status": "error", "message": str(e)}
+    ctx.context.delivery = result
+    return result
 
 # =============================================================================
 # ENHANCED EMAIL AGENT - OgaAgent
@@ -205,8 +203,9 @@ async def plan_research_strategy(query: str) -> WebSearchPlan:
         
         #Six lines of codes were removed for privacy reasons.
 
-async def execute_searches(search_plan: WebSearchPlan) -> List[SearchResult]:
-    """ Execute all planned searches with error handling and progress tracking """
+async def execute_searches(search_plan: WebSearchPlan, query: Optional[str] = None) -> List[SearchResult]:
+    """ Execute all planned searches with error handling and progress tracking.
+    When the original query is given, results are scored for relevance against it. """
     logger.info("�� Executing searches...")
     
     # Sort searches by priority
@@ -234,6 +233,9 @@ async def execute_searches(search_plan: WebSearchPlan) -> List[SearchResult]:
                 valid_results.append(result)
         
         logger.info(f"✅ Completed {len(valid_results)}/{len(search_tasks)} searches successfully")
+
+        if query:
+            valid_results = await score_results(query, valid_results)
         return valid_results
         
     except asyncio.TimeoutError:
@@ -245,12 +247,14 @@ async def execute_single_search(search_item: WebSearchItem) -> SearchResult:
     try:
         search_input = f"Search Query: {search_item.query}\nReason: {search_item.reason}\nPriority: {search_item.priority}"
         result = await Runner.run(search_agent, search_input)
+        sources = extract_sources(result.final_output)
         
         return SearchResult(
             query=search_item.query,
             summary=result.final_output,
-            sources_count=1,  # WebSearchTool doesn't provide source count
-            relevance_score=0.8  # Default relevance score
+            sources_count=len(sources),
+            relevance_score=1.0,  # Treated as fully relevant until score_results runs
+            sources=sources
         )
         
     except Exception as e:
@@ -260,14 +264,14 @@ async def execute_single_search(search_item: WebSearchItem) -> SearchResult:
 # =============================================================================
 # ENHANCED REPORT GENERATION
 # =============================================================================
-async def generate_comprehensive_report(query: str, search_results: List[SearchResult]) -> ReportData:
-    """ Generate a comprehensive research report from search results """
-    logger.info("�� Generating comprehensive report...")
-    
-    try:
-        # Prepare input for writer agent
-        search_summaries = [f"Query: {r.query}\nSummary: {r.summary}" for r in search_results]
-        writer_input = f"""
+def build_writer_input(query: str, search_results: List[SearchResult]) -> str:
+    """ Build the writer agent prompt from the original query and the relevant search summaries """
+    search_summaries = [
+        f"Query: {r.query}\nRelevance: {r.relevance_score:.2f}\nSummary: {r.summary}"
+        + (f"\nSources: {', '.join(r.sources)}" if r.sources else "")
+        for r in filter_relevant(search_results)
+    ]
+    return f"""
 Original Research Query: {query}
 
 Search Results:
@@ -275,10 +279,59 @@ Search Results:
 
 Please create a comprehensive career market research report based on this information, focusing on job demand, salary ranges, and career prospects.
 """
+
+def merge_sources(report_sources: List[str], search_results: List[SearchResult]) -> List[str]:
+    """ Combine the writer's source list with the URLs found by the searches it was given """
+    merged = list(report_sources)
+    for result in search_results:
+        for url in result.sources:
+            if url not in merged:
+                merged.append(url)
+    return merged
+
+async def generate_comprehensive_report(query: str, search_results: List[SearchResult]) -> ReportData:
+    """ Generate a comprehensive research report from search results """
+    logger.info("�� Generating comprehensive report...")
+    
+    try:
+        # Prepare input for writer agent
+        writer_input = build_writer_input(query, search_results)
         
        #Hey, I removed 11 lines of codes for privacy reasons.
+async def generate_report_streaming(query: str, search_results: List[SearchResult],
+                                    on_field: Callable[[str, Any], None] = log_report_field,
+                                    report_path: Optional[str] = None) -> ReportData:
+    """ Generate the report while streaming it: title, executive summary and key findings are
+    handed to `on_field` as soon as each is parsed, and the detailed report is written to
+    `report_path` (default: inside the query's run directory) as it is generated """
+    logger.info("�� Streaming comprehensive report...")
+    report_path = report_path or ResearchCheckpoint(query).artifact_path(ReportStreamConfig.DETAILED_REPORT_FILE)
+
+    parser = ReportStreamParser()
+    report_file = ProgressiveReportFile(report_path)
+    try:
+        result = Runner.run_streamed(writer_agent, build_writer_input(query, search_results))
+        async for event in result.stream_events():
+            if event.type != "raw_response_event" or not isinstance(event.data, ResponseTextDeltaEvent):
+                continue
+            for kind, key, value in parser.feed(event.data.delta):
+                if kind == PARTIAL and key == ReportStreamConfig.PROGRESSIVE_FIELD:
+                    report_file.write(value)
+                elif kind == FIELD and key in ReportStreamConfig.EARLY_FIELDS:
+                    on_field(key, value)
+
+        report = result.final_output_as(ReportData)
+        logger.info(f"✅ Report streamed; detailed report saved to {report_path}")
+        return report
+
+    except Exception as e:
+        logger.error(f"❌ Streaming report generation failed: {str(e)}")
+        raise
+    finally:
+        report_file.close()
+
 async def send_research_report(report: ReportData, recipient_email: str = None) -> Dict[str, str]:
-    """ Send the research report via email using OgaAgent """
+    """ Send the research report via email using OgaAgent; returns the actual delivery result """
     logger.info("📧 Sending research report via OgaAgent...")
     
     try:
@@ -297,11 +350,21 @@ async def send_research_report(report: ReportData, recipient_email: str = None)
         <p><small>Report generated on {report.generated_at}</small></p>
         """
         
-        subject = f"Career Market Report: {report.title}"
-        result = await Runner.run(OgaAgent, email_content)
-        
-        logger.info("✅ Report sent successfully via OgaAgent")
-        return {"status": "success", "message": "Report sent via email"}
+        # Recipients travel in the run context so the agent cannot drop or rewrite them, and the
+        # tool's delivery result comes back the same way
+        context = EmailRunContext(recipients=parse_recipients(recipient_email))
+        if not context.recipients:
+            return {"status": "error", "message": "No email recipients given"}
+        await Runner.run(OgaAgent, email_content, context=context)
+
+        if context.delivery is None:
+            logger.error("❌ OgaAgent finished without sending the email")
+            return {"status": "error", "message": "OgaAgent did not call send_research_email"}
+        if context.delivery.get("status") == "success":
+            logger.info("✅ Report sent successfully via OgaAgent")
+        else:
+            logger.warning(f"⚠️ Report email {context.delivery.get('status')}: {context.delivery.get('message')}")
+        return context.delivery
         
     except Exception as e:
         logger.error(f"❌ Email sending failed: {str(e)}")
@@ -310,12 +373,67 @@ async def send_research_report(report: ReportData, recipient_email: str = None)
 # =============================================================================
 # MAIN ENHANCED WORKFLOW
 # =============================================================================
-async def run_enhanced_research(query: str, send_email: bool = True, recipient_email: str = None) -> ReportData:
-    """ Complete enhanced research workflow with error handling and progress tracking """
+async def run_enhanced_research(query: str, send_email: bool = True, recipient_email: str = None,
+                                resume: bool = True, force_from: Optional[str] = None,
+                                stream_report: bool = False) -> ReportData:
+    """ Complete enhanced research workflow with error handling and progress tracking.
+
+    Each stage's output is checkpointed under output/runs/<query hash>/, so a rerun of the
+    same query resumes at the first missing stage. Pass resume=False to recompute everything,
+    or force_from="plan" | "searches" | "report" | "email" to recompute from that stage on.
+    With stream_report=True the writer output is streamed (see generate_report_streaming).
+    """
     
     logger.info(f"🚀 Starting enhanced research for: {query[:100]}...")
     
-    #Hello, 20 lines were removed for privacy reasons.
+    checkpoint = ResearchCheckpoint(query)
+    if not resume:
+        checkpoint.invalidate_from(CheckpointConfig.STAGES[0])
+    elif force_from:
+        checkpoint.invalidate_from(force_from)
+
+    try:
+        trace_id = gen_trace_id()
+        with trace("Enhanced Research", trace_id=trace_id):
+            search_plan = checkpoint.load("plan", WebSearchPlan)
+            if search_plan is None:
+                search_plan = await plan_research_strategy(query)
+                checkpoint.save("plan", search_plan, WebSearchPlan)
+
+            search_results = checkpoint.load("searches", List[SearchResult])
+            if search_results is None:
+                search_results = await execute_searches(search_plan, query)
+                if search_results:
+                    checkpoint.save("searches", search_results, List[SearchResult])
+
+            report = checkpoint.load("report", ReportData)
+            if report is None:
+                # Only the results the writer sees are cited as sources
+                relevant_results = filter_relevant(search_results)
+                if stream_report:
+                    report = await generate_report_streaming(
+                        query, relevant_results,
+                        report_path=checkpoint.artifact_path(ReportStreamConfig.DETAILED_REPORT_FILE))
+                else:
+                    report = await generate_comprehensive_report(query, relevant_results)
+                report.sources = merge_sources(report.sources, relevant_results)
+                checkpoint.save("report", report, ReportData)
+
+            if send_email:
+                # The email checkpoint only counts for the recipients it was sent to
+                recipients = sorted(r.email for r in parse_recipients(recipient_email))
+                sent = checkpoint.load("email", Dict[str, Any])
+                if sent is not None and sent.get("recipients") != recipients:
+                    logger.info("📧 Recipients changed since the last send, emailing again")
+                    sent = None
+                if sent is None:
+                    email_result = await send_research_report(report, recipient_email)
+                    if email_result.get("status") == "success":
+                        checkpoint.save("email", {**email_result, "recipients": recipients}, Dict[str, Any])
+
+        logger.info("🎉 Research workflow completed")
+        return report
+
     except Exception as e:
         logger.error(f"❌ Research workflow failed: {str(e)}")
         raise
@@ -343,7 +461,12 @@ async def main():
     - Combined skill set advantages
     """
     
+    # Keep retrying queued emails while the run is in progress; the first pass delivers
+    # anything left in the queue by earlier runs
+    retry_worker = asyncio.create_task(email_delivery.run_retry_worker())
+
     try:
+
         # Run enhanced research
         report = await run_enhanced_research(
             query=query,
@@ -362,6 +485,13 @@ async def main():
     except Exception as e:
         logger.error(f"Research failed: {str(e)}")
         return None
+    finally:
+        retry_worker.cancel()
+        try:
+            await retry_worker
+        except asyncio.CancelledError:
+            pass
+        await email_delivery.aclose()
 
 # Run if executed directly
 if __name__ == "__main__":
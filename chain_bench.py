@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# Prompt-Chain Benchmark
+# Run the lab prompt chains across a model x seed matrix and compare latency, tokens and cost
+#
+# Usage:
+#   python chain_bench.py --chain iq_question --models gpt-4.1-nano,gpt-4.1-mini --seeds 10
+#   python chain_bench.py --chain agentic_opportunity --record output/bench/agentic.json
+#   python chain_bench.py --chain agentic_opportunity --replay output/bench/agentic.json   # offline
+#   python chain_bench.py --stub                                                           # offline, synthetic
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from dotenv import load_dotenv
+from llm_gateway import configure_gateway, get_gateway
+from openai import AsyncOpenAI
+from persona_load_test import StubOpenAIServer, percentile
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv(override=True)
+
+# =============================================================================
+# CHAIN DEFINITIONS
+# =============================================================================
+class ChainStep(BaseModel):
+    name: str = Field(description="Step name; its output can be referenced as {name} by later steps")
+    prompt: str = Field(description="User prompt template, formatted with earlier step outputs")
+
+class Chain(BaseModel):
+    name: str = Field(description="Chain name")
+    steps: List[ChainStep] = Field(description="Steps run in order within one conversation")
+
+CHAINS: Dict[str, Chain] = {
+    # code_lab1.py: generate a hard IQ question, then answer it
+    "iq_question": Chain(name="iq_question", steps=[
+        ChainStep(name="question", prompt="Please propose a hard, challenging question to assess someone's IQ. Respond only with the question."),
+        ChainStep(name="answer", prompt="{question}"),
+    ]),
+    # code_lab1.py classwork: business area -> pain point -> agentic solution
+    "agentic_opportunity": Chain(name="agentic_opportunity", steps=[
+        ChainStep(name="business_idea", prompt="pick a business area that might be worth exploring for an Agentic AI opportunity."),
+        ChainStep(name="pain_point", prompt="Present a pain-point in the {business_idea} industry that might be ripe for an Agentic solution."),
+        ChainStep(name="solution", prompt="Propose an Agentic AI solution for this pain-point: {pain_point}"),
+    ]),
+}
+
+# USD per 1M tokens (input, output)
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """ USD cost of one call; NaN for models missing from MODEL_PRICES so they never look free """
+    if model not in MODEL_PRICES:
+        return float("nan")
+    input_price, output_price = MODEL_PRICES[model]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+# =============================================================================
+# RESULT MODELS
+# =============================================================================
+class StepResult(BaseModel):
+    chain: str
+    model: str
+    seed: int
+    step: str
+    latency_s: float
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    output: str
+
+# =============================================================================
+# COMPLETIONS
+# =============================================================================
+async def complete(client: AsyncOpenAI, model: str, seed: int, messages: List[dict]) -> dict:
+    """ One chat completion with its usage and wall-clock latency.
+
+    Recording and replay happen underneath in the gateway's cassette; replay sleeps for each
+    response's recorded latency, so replayed timings match the recorded run.
+    """
+    start = time.perf_counter()
+    response = await client.chat.completions.create(model=model, messages=messages, seed=seed)
+    return {
+        "content": response.choices[0].message.content,
+        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
+        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
+        "latency_s": time.perf_counter() - start,
+    }
+
+# =============================================================================
+# CHAIN RUNNER
+# =============================================================================
+async def run_chain(client: AsyncOpenAI, chain: Chain, model: str, seed: int) -> List[StepResult]:
+    """ Run every step of a chain in one conversation, as the lab scripts do """
+    messages: List[dict] = []
+    outputs: Dict[str, str] = {}
+    results: List[StepResult] = []
+    for step in chain.steps:
+        messages.append({"role": "user", "content": step.prompt.format(**outputs)})
+        completion = await complete(client, model, seed, messages)
+        outputs[step.name] = completion["content"]
+        messages.append({"role": "assistant", "content": completion["content"]})
+        results.append(StepResult(
+            chain=chain.name, model=model, seed=seed, step=step.name,
+            latency_s=completion["latency_s"],
+            prompt_tokens=completion["prompt_tokens"],
+            completion_tokens=completion["completion_tokens"],
+            cost_usd=estimate_cost(model, completion["prompt_tokens"], completion["completion_tokens"]),
+            output=completion["content"],
+        ))
+    return results
+
+async def run_matrix(client: AsyncOpenAI, chain: Chain, models: List[str], seeds: List[int],
+                     concurrency: int = 8) -> List[StepResult]:
+    """ Run the chain for every (model, seed) pair, at most `concurrency` chains at a time """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(model: str, seed: int) -> List[StepResult]:
+        async with semaphore:
+            try:
+                return await run_chain(client, chain, model, seed)
+            except Exception as e:
+                logger.error(f"❌ {chain.name} failed for {model} seed {seed}: {str(e)}")
+                return []
+
+    runs = await asyncio.gather(*[guarded(model, seed) for model in models for seed in seeds])
+    return [result for run in runs for result in run]
+
+# =============================================================================
+# COMPARISON TABLE
+# =============================================================================
+def compare_models(results: List[StepResult]) -> List[dict]:
+    """ One row per model with per-chain latency percentiles, mean tokens and mean cost """
+    rows = []
+    for model in dict.fromkeys(r.model for r in results):
+        runs: Dict[int, List[StepResult]] = {}
+        for r in results:
+            if r.model == model:
+                runs.setdefault(r.seed, []).append(r)
+        latencies = [sum(s.latency_s for s in steps) for steps in runs.values()]
+        rows.append({
+            "model": model,
+            "runs": len(runs),
+            "p50_s": percentile(latencies, 50),
+            "p95_s": percentile(latencies, 95),
+            "tokens": sum(s.prompt_tokens + s.completion_tokens for steps in runs.values() for s in steps) / len(runs),
+            "cost_usd": sum(s.cost_usd for steps in runs.values() for s in steps) / len(runs),
+            "step_p50_s": {step: percentile([s.latency_s for steps in runs.values() for s in steps if s.step == step], 50)
+                           for step in dict.fromkeys(s.step for steps in runs.values() for s in steps)},
+        })
+    # Unpriced models (NaN cost) sort last
+    return sorted(rows, key=lambda row: (math.isnan(row["cost_usd"]), row["cost_usd"]))
+
+def cheapest_within(rows: List[dict], latency_target: float) -> Optional[str]:
+    """ Cheapest priced model whose p95 chain latency meets the target """
+    for row in rows:  # already sorted by cost
+        if not math.isnan(row["cost_usd"]) and row["p95_s"] <= latency_target:
+            return row["model"]
+    return None
+
+def print_table(rows: List[dict], latency_target: Optional[float] = None) -> None:
+    header = f"{'model':<16} {'runs':>5} {'p50 s':>8} {'p95 s':>8} {'tokens':>8} {'cost/run $':>11}  step p50 s"
+    print(header)
+    print("-" * (len(header) + 20))
+    for row in rows:
+        steps = ", ".join(f"{step}={value:.2f}" for step, value in row["step_p50_s"].items())
+        cost = "unknown" if math.isnan(row["cost_usd"]) else f"{row['cost_usd']:.6f}"
+        print(f"{row['model']:<16} {row['runs']:>5} {row['p50_s']:>8.2f} {row['p95_s']:>8.2f} "
+              f"{row['tokens']:>8.0f} {cost:>11}  {steps}")
+    if latency_target is not None:
+        choice = cheapest_within(rows, latency_target)
+        print(f"\nCheapest model with p95 <= {latency_target:.1f}s: {choice or 'none'}")
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark a prompt chain across models and seeds")
+    parser.add_argument("--chain", choices=sorted(CHAINS), default="iq_question")
+    parser.add_argument("--models", type=lambda s: s.split(","), default=["gpt-4.1-nano", "gpt-4.1-mini"])
+    parser.add_argument("--seeds", type=int, default=5, help="number of seeds (runs) per model")
+    parser.add_argument("--concurrency", type=int, default=8, help="chains running at once")
+    parser.add_argument("--latency-target", type=float, default=10.0, help="p95 chain latency target in seconds")
+    parser.add_argument("--record", help="record every response to this gateway cassette for offline replay")
+    parser.add_argument("--replay", help="replay responses from this gateway cassette instead of calling the API")
+    parser.add_argument("--stub", action="store_true", help="run against a local OpenAI-compatible stub server")
+    parser.add_argument("--output", help="write every step result to this JSON file")
+    return parser.parse_args()
+
+async def main(args: argparse.Namespace) -> List[dict]:
+    chain = CHAINS[args.chain]
+    seeds = list(range(args.seeds))
+    for model in args.models:
+        if model not in MODEL_PRICES:
+            logger.warning(f"⚠️ No price for {model} in MODEL_PRICES; its cost is unknown and it is never recommended")
+    if args.replay:
+        gateway = configure_gateway("replay", args.replay, replay_latency=True)
+    elif args.record:
+        gateway = configure_gateway("record", args.record)
+    else:
+        gateway = get_gateway()
+
+    stub = None
+    if args.stub and not args.replay:
+        stub = await StubOpenAIServer().start()
+        client = AsyncOpenAI(base_url=stub.base_url, api_key="stub", http_client=gateway.async_http_client)
+    else:
+        client = gateway.async_openai_client()
+
+    try:
+        logger.info(f"🏁 Running {chain.name} on {len(args.models)} model(s) x {len(seeds)} seed(s)")
+        results = await run_matrix(client, chain, args.models, seeds, args.concurrency)
+    finally:
+        await client.close()
+        if stub is not None:
+            await stub.stop()
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([r.model_dump() for r in results], f, indent=2)
+
+    rows = compare_models(results)
+    print_table(rows, args.latency_target)
+    return rows
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
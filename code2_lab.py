@@ -1,42 +1,49 @@
 from dotenv import load_dotenv
-from openai import OpenAI
-from pypdf import PdfReader
 import gradio as gr
 from pydantic import BaseModel
 import json
+import os
+from profile_ingest import load_profile
+from persona_retrieval import ProfileIndex, build_retrieval_prompt
+from persona_evaluation import ResponseEvaluator
+from persona_serving import AsyncPersonaChat, serve_async
+from conversation_memory import history_manager, format_transcript
+from llm_gateway import openai_client
 
 # Load environment and initialize OpenAI client (expects OPENAI_API_KEY in env)
+# Both names share the gateway's pooled, rate-limited client
 load_dotenv(override=True)
-openai = OpenAI()
-client = OpenAI()  # or OpenAI(api_key="***REDACTED***")
+openai = openai_client()
+client = openai_client()
 
-# Read LinkedIn PDF (adjust path if needed)
-reader = PdfReader(r"1_foundations/me/Profile (2).pdf")
-linkedin = ""
-for page in reader.pages:
-    text = page.extract_text()
-    if text:
-        linkedin += text
-
-# Load summary
-with open("1_foundations/me/summary.txt", "r", encoding="utf-8") as f:
-    summary = f.read()
+# LinkedIn PDF and summary (adjust paths if needed)
+PROFILE_PDF = r"1_foundations/me/Profile (2).pdf"
+SUMMARY_PATH = "1_foundations/me/summary.txt"
 
 # Persona and system prompt
 name = "Okafor Peter Chidera"
 
-system_prompt = f"You are acting as {name}. You are answering questions on {name}'s website, " \
-                f"particularly questions related to {name}'s career, background, skills and experience. " \
-                f"Your responsibility is to represent {name} for interactions on the website as faithfully as possible. " \
-                f"You are given a summary of {name}'s background and LinkedIn profile which you can use to answer questions. " \
-                f"Be professional and engaging, as if talking to a potential client or future employer who came across the website. " \
-                f"If you don't know the answer, say so."
+system_intro = f"You are acting as {name}. You are answering questions on {name}'s website, " \
+               f"particularly questions related to {name}'s career, background, skills and experience. " \
+               f"Your responsibility is to represent {name} for interactions on the website as faithfully as possible. " \
+               f"You are given a summary of {name}'s background and LinkedIn profile which you can use to answer questions. " \
+               f"Be professional and engaging, as if talking to a potential client or future employer who came across the website. " \
+               f"If you don't know the answer, say so."
+
+profile_index = None  # Built by load_persona() before the app launches
+
+def load_persona():
+    """ Load the cached profile and its vector index once per start """
+    global profile_index
+    profile = load_profile(PROFILE_PDF, SUMMARY_PATH)
+    profile_index = ProfileIndex.build(profile)
 
-system_prompt += f"\n\n## Summary:\n{summary}\n\n## LinkedIn Profile:\n{linkedin}\n\n"
-system_prompt += f"With this context, please chat with the user, always staying in character as {name}."
+def persona_prompt(message):
+    """ System prompt carrying only the profile excerpts relevant to this message """
+    return build_retrieval_prompt(system_intro, profile_index.context_for(message), name)
 
 def chat(message, history):
-    messages = [{"role": "system", "content": system_prompt}] + history + [{"role": "user", "content": message}]
+    messages = [{"role": "system", "content": persona_prompt(message)}] + history_manager.bounded(history) + [{"role": "user", "content": message}]
     response = openai.chat.completions.create(model="gpt-4o-mini", messages=messages)
     return response.choices[0].message.content
 
@@ -56,7 +63,7 @@ Please reply ONLY in JSON with the following keys:
 """
 
 def evaluator_user_prompt(reply, message, history):
-    user_prompt = f"Here's the conversation between the User and the Agent:\n\n{history}\n\n"
+    user_prompt = f"Here's the conversation between the User and the Agent:\n\n{format_transcript(history_manager.bounded(history))}\n\n"
     user_prompt += f"Here's the latest message from the User:\n\n{message}\n\n"
     user_prompt += f"Here's the latest response from the Agent:\n\n{reply}\n\n"
     user_prompt += "Please evaluate the response in JSON format."
@@ -78,35 +85,55 @@ def evaluate(reply, message, history) -> Evaluation:
     except (json.JSONDecodeError, ValueError):
         return Evaluation.model_validate_json(content)
 
+response_evaluator = ResponseEvaluator(evaluate)
+
 def rerun(reply, message, history, feedback):
-    updated_system_prompt = system_prompt + "\n\n## Previous answer rejected\nYou just tried to reply, but the quality control rejected your reply\n"
+    updated_system_prompt = persona_prompt(message) + "\n\n## Previous answer rejected\nYou just tried to reply, but the quality control rejected your reply\n"
     updated_system_prompt += f"## Your attempted answer:\n{reply}\n\n"
     updated_system_prompt += f"## Reason for rejection:\n{feedback}\n\n"
-    messages = [{"role": "system", "content": updated_system_prompt}] + history + [{"role": "user", "content": message}]
+    messages = [{"role": "system", "content": updated_system_prompt}] + history_manager.bounded(history) + [{"role": "user", "content": message}]
     response = openai.chat.completions.create(model="gpt-4o-mini", messages=messages)
     return response.choices[0].message.content
 
-def chat(message, history):
+def build_messages(message, history):
     if "patent" in message:
-        system = system_prompt + "\n\nEverything in your reply needs to be in pig latin - it is mandatory that you respond only and entirely in pig latin"
+        system = persona_prompt(message) + "\n\nEverything in your reply needs to be in pig latin - it is mandatory that you respond only and entirely in pig latin"
     else:
-        system = system_prompt
+        system = persona_prompt(message)
 
     # Some providers may require clean history objects:
     # history = [{"role": h["role"], "content": h["content"]} for h in history]
 
-    messages = [{"role": "system", "content": system}] + history + [{"role": "user", "content": message}]
-    response = openai.chat.completions.create(model="gpt-4o-mini", messages=messages)
-    reply = response.choices[0].message.content
-
-    evaluation = evaluate(reply, message, history)
+    return [{"role": "system", "content": system}] + history_manager.bounded(history) + [{"role": "user", "content": message}]
 
-    if evaluation.is_acceptable:
-        pass
-    else:
-        reply = rerun(reply, message, history, evaluation.feedback)
+def review_reply(reply, message, history):
+    """ Return a rerun reply if the evaluator rejects this one, otherwise None """
+    # Risky turns are checked now; sampled turns are audited in the background
+    evaluation = response_evaluator.check(reply, message, history)
 
-    return reply
+    if evaluation is not None and not evaluation.is_acceptable:
+        return rerun(reply, message, history, evaluation.feedback)
+    return None
 
-# Launch Gradio chat
-gr.ChatInterface(chat, type="messages").launch()
+def chat(message, history):
+    messages = build_messages(message, history)
+    stream = openai.chat.completions.create(model="gpt-4o-mini", messages=messages, stream=True)
+
+    # Stream the reply to the user as it is generated
+    reply = ""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            reply += chunk.choices[0].delta.content
+            yield reply
+
+    replacement = review_reply(reply, message, history)
+    if replacement is not None:
+        yield replacement
+
+# Launch Gradio chat (set PERSONA_SERVING=async for the multi-user async server)
+if __name__ == "__main__":
+    load_persona()
+    if os.getenv("PERSONA_SERVING") == "async":
+        serve_async(AsyncPersonaChat(build_messages, after_reply=review_reply))
+    else:
+        gr.ChatInterface(chat, type="messages").launch()
@@ -25,14 +25,16 @@ else:
 # If you get an import error - head over to troubleshooting in the Setup folder
 # Even for other LLM providers like Gemini, you still use this OpenAI import - see Guide 9 for why
 
-from openai import OpenAI
+from llm_gateway import openai_client
 
 # And now we'll create an instance of the OpenAI class
 # If you're not sure what it means to create an instance of a class - head over to the guides folder (guide 6)!
 # If you get a NameError - head over to the guides folder (guide 6)to learn about NameErrors - always instantly fixable
 # If you're not using OpenAI, you just need to slightly modify this - precise instructions are in the AI APIs guide (guide 9)
+# The gateway's client is an OpenAI instance on a shared, rate-limited connection pool
+# (set LLM_GATEWAY_MODE=replay to rerun this notebook offline from a recorded cassette)
 
-openai = OpenAI()
+openai = openai_client()
 
 # Create a list of messages in the familiar OpenAI format
 
@@ -88,8 +90,7 @@ display(Markdown(answer))
 #Then ask the LLM to present a pain-point in that industry - something challenging that might be ripe for an Agentic solution.<br/>
 #Finally have 3 third LLM call propose the Agentic AI solution.
 
-# First create the messages:
-import openai
+# First create the messages (reusing the gateway client from above):
 
 messages = [{"role": "user", "content": "pick a business area that might be worth exploring for an Agentic AI opportunity."}]
 
@@ -1,20 +1,25 @@
 # imports
 from dotenv import load_dotenv
-from openai import OpenAI
+import atexit
 import json
 import os
-import requests
-from pypdf import PdfReader
+from concurrent.futures import ThreadPoolExecutor
 import gradio as gr
+from push_notifier import notifier
+from profile_ingest import load_profile
+from persona_retrieval import ProfileIndex, build_retrieval_prompt
+from persona_serving import AsyncPersonaChat, serve_async
+from conversation_memory import history_manager
+from semantic_cache import SemanticCache
+from llm_gateway import openai_client
 
 # The usual start
 load_dotenv(override=True)
-openai = OpenAI()
+openai = openai_client()
 
 # For pushover (set PUSHOVER_USER and PUSHOVER_TOKEN in your .env)
 pushover_user = os.getenv("PUSHOVER_USER")
 pushover_token = os.getenv("PUSHOVER_TOKEN")
-pushover_url = "https://api.pushover.net/1/messages.json"
 
 if pushover_user:
     print(f"Pushover user found and starts with {pushover_user[0]}")
@@ -28,8 +33,8 @@ else:
 
 def push(message: str):
     print(f"Push: {message}")
-    payload = {"user": pushover_user, "token": pushover_token, "message": message}
-    requests.post(pushover_url, data=payload)
+    # Sent from a background queue so tool calls return without waiting on Pushover
+    notifier.push(message)
 
 # Example push
 # push("HEY!!")
@@ -93,63 +98,114 @@ def handle_tool_calls(tool_calls):
         results.append({"role": "tool", "content": json.dumps(result), "tool_call_id": tool_call.id})
     return results
 
-# Alternative dynamic-dispatch version (more elegant)
+# Alternative dynamic-dispatch version (more elegant), running all calls of a turn concurrently
+tool_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tool")
+
+# Only functions declared in `tools` can be called; names come from the model, so never look them up in globals()
+tool_functions = {tool["function"]["name"]: globals()[tool["function"]["name"]] for tool in tools}
+
+def run_tool_call(tool_call):
+    tool_name = tool_call["function"]["name"]
+    arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+    print(f"Tool called: {tool_name}", flush=True)
+    tool = tool_functions.get(tool_name)
+    result = tool(**arguments) if tool else {}
+    return {"role": "tool", "content": json.dumps(result), "tool_call_id": tool_call["id"]}
+
 def handle_tool_calls(tool_calls):
-    results = []
-    for tool_call in tool_calls:
-        tool_name = tool_call.function.name
-        arguments = json.loads(tool_call.function.arguments)
-        print(f"Tool called: {tool_name}", flush=True)
-        tool = globals().get(tool_name)
-        result = tool(**arguments) if tool else {}
-        results.append({"role": "tool", "content": json.dumps(result), "tool_call_id": tool_call.id})
-    return results
+    return list(tool_executor.map(run_tool_call, tool_calls))
 
 # Load resources
-reader = PdfReader("1_foundations/me/linkedin.pdf")
-linkedin = ""
-for page in reader.pages:
-    text = page.extract_text()
-    if text:
-        linkedin += text
-
-with open("1_foundations/me/summary.txt", "r", encoding="utf-8") as f:
-    summary = f.read()
+PROFILE_PDF = "1_foundations/me/linkedin.pdf"
+SUMMARY_PATH = "1_foundations/me/summary.txt"
 
 name = "Okafor Peter" # Change to your name
 
-system_prompt = f"You are acting as {name}. You are answering questions on {name}'s website, " \
-                f"particularly questions related to {name}'s career, background, skills and experience. " \
-                f"Your responsibility is to represent {name} for interactions on the website as faithfully as possible. " \
-                f"You are given a summary of {name}'s background and LinkedIn profile which you can use to answer questions. " \
-                f"Be professional and engaging, as if talking to a potential client or future employer who came across the website. " \
-                f"If you don't know the answer to any question, use your record_unknown_question tool to record the question that you couldn't answer, even if it's about something trivial or unrelated to career. " \
-                f"If the user is engaging in discussion, try to steer them towards getting in touch via email; ask for their email and record it using your record_user_details tool. "
+system_intro = f"You are acting as {name}. You are answering questions on {name}'s website, " \
+               f"particularly questions related to {name}'s career, background, skills and experience. " \
+               f"Your responsibility is to represent {name} for interactions on the website as faithfully as possible. " \
+               f"You are given a summary of {name}'s background and LinkedIn profile which you can use to answer questions. " \
+               f"Be professional and engaging, as if talking to a potential client or future employer who came across the website. " \
+               f"If you don't know the answer to any question, use your record_unknown_question tool to record the question that you couldn't answer, even if it's about something trivial or unrelated to career. " \
+               f"If the user is engaging in discussion, try to steer them towards getting in touch via email; ask for their email and record it using your record_user_details tool. "
+
+profile_index = None  # Built by load_persona() before the app launches
+
+# Answers to repeat questions, reusing the retrieval index's cached message embeddings
+answer_cache = SemanticCache(embed=lambda text: profile_index.embed_query(text))
+atexit.register(answer_cache.save)
+
+# Replies that recorded a visitor's contact details are personal and never reused
+PRIVATE_TOOLS = {"record_user_details"}
 
-system_prompt += f"\n\n## Summary:\n{summary}\n\n## LinkedIn Profile:\n{linkedin}\n\n"
-system_prompt += f"With this context, please chat with the user, always staying in character as {name}."
+def load_persona():
+    """ Load the cached profile and its vector index once per start """
+    global profile_index
+    profile = load_profile(PROFILE_PDF, SUMMARY_PATH)
+    profile_index = ProfileIndex.build(profile)
+    answer_cache.reset_for(profile.fingerprint)
+
+def persona_prompt(message):
+    """ System prompt carrying only the profile excerpts relevant to this message """
+    return build_retrieval_prompt(system_intro, profile_index.context_for(message), name)
+
+def build_messages(message, history):
+    return [{"role": "system", "content": persona_prompt(message)}] + history_manager.bounded(history) + [{"role": "user", "content": message}]
 
 def chat(message, history):
-    messages = [{"role": "system", "content": system_prompt}] + history + [{"role": "user", "content": message}]
-    done = False
-    while not done:
-        response = openai.chat.completions.create(
+    cached = answer_cache.lookup(message, history)
+    if cached is not None:
+        print(f"Answer cache hit: {answer_cache.stats()}", flush=True)
+        yield cached
+        return
+
+    messages = build_messages(message, history)
+    tools_used = set()
+    while True:
+        stream = openai.chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
-            tools=tools
+            tools=tools,
+            stream=True
         )
-        finish_reason = response.choices[0].finish_reason
-
-        if finish_reason == "tool_calls":
-            message_obj = response.choices[0].message
-            tool_calls = message_obj.tool_calls
-            results = handle_tool_calls(tool_calls)
-            messages.append(message_obj)
-            messages.extend(results)
-        else:
-            done = True
-
-    return response.choices[0].message.content
 
-# Launch Gradio chat
-gr.ChatInterface(chat, type="messages").launch()
+        # Yield text as it arrives and assemble any tool calls from their streamed fragments
+        reply = ""
+        tool_calls = {}
+        finish_reason = None
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                reply += choice.delta.content
+                yield reply
+            for call in choice.delta.tool_calls or []:
+                entry = tool_calls.setdefault(call.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                if call.id:
+                    entry["id"] = call.id
+                if call.function and call.function.name:
+                    entry["function"]["name"] += call.function.name
+                if call.function and call.function.arguments:
+                    entry["function"]["arguments"] += call.function.arguments
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+
+        if finish_reason != "tool_calls":
+            if not tools_used & PRIVATE_TOOLS:
+                answer_cache.store(message, history, reply)
+            return
+
+        calls = [tool_calls[index] for index in sorted(tool_calls)]
+        tools_used.update(call["function"]["name"] for call in calls)
+        messages.append({"role": "assistant", "content": reply or None, "tool_calls": calls})
+        messages.extend(handle_tool_calls(calls))
+
+# Launch Gradio chat (set PERSONA_SERVING=async for the multi-user async server)
+if __name__ == "__main__":
+    load_persona()
+    if os.getenv("PERSONA_SERVING") == "async":
+        serve_async(AsyncPersonaChat(build_messages, tools=tools, run_tool_call=run_tool_call,
+                                     answer_cache=answer_cache, private_tools=PRIVATE_TOOLS))
+    else:
+        gr.ChatInterface(chat, type="messages").launch()
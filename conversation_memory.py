@@ -0,0 +1,174 @@
+# Conversation Memory
+# Bounded chat history: the last few turns verbatim plus a rolling summary of everything older
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from llm_gateway import openai_client
+from typing import Callable, List, Set, Tuple
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+except Exception:  # tiktoken missing or its encoding unavailable offline
+    def count_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class MemoryConfig:
+    RECENT_TURNS = 6  # user/assistant exchanges kept verbatim
+    TOKEN_BUDGET = 3000  # tokens for summary + recent messages together
+    SUMMARY_MAX_TOKENS = 400
+    SUMMARY_MODEL = "gpt-4o-mini"
+    CACHE_SIZE = 512  # summaries remembered across sessions
+    BACKGROUND_WORKERS = 2
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a chat between a website visitor and an agent.
+Update the existing summary with the new messages. Keep names, contact details, questions asked, commitments
+made and anything the visitor said about themselves. Drop pleasantries. Reply with the summary only, under 250 words."""
+
+def message_tokens(message: dict) -> int:
+    return count_tokens(str(message.get("content") or "")) + 4  # role and formatting overhead
+
+def format_transcript(messages: List[dict]) -> str:
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+# =============================================================================
+# SUMMARIZER
+# =============================================================================
+def summarize_messages(previous_summary: str, messages: List[dict]) -> str:
+    """ Fold new messages into the running summary with one small LLM call """
+    transcript = format_transcript(messages)
+    response = openai_client().chat.completions.create(
+        model=MemoryConfig.SUMMARY_MODEL,
+        max_tokens=MemoryConfig.SUMMARY_MAX_TOKENS,
+        messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"## Existing summary:\n{previous_summary or '(none)'}\n\n## New messages:\n{transcript}"},
+        ],
+    )
+    return response.choices[0].message.content.strip()
+
+# =============================================================================
+# HISTORY MANAGER
+# =============================================================================
+class HistoryManager:
+    """ Turns an ever-growing Gradio history into a view of fixed size.
+
+    The last RECENT_TURNS exchanges are kept verbatim; older messages are folded into a
+    summary that is refreshed on a background thread. Until a refresh lands, the newest
+    available summary is used along with as many not-yet-summarized messages as fit the
+    budget, so a turn never waits on summarization.
+    """
+
+    def __init__(self, recent_turns: int = MemoryConfig.RECENT_TURNS, token_budget: int = MemoryConfig.TOKEN_BUDGET,
+                 summarize: Callable[[str, List[dict]], str] = summarize_messages):
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()  # prefix hash -> summary of that prefix
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=MemoryConfig.BACKGROUND_WORKERS, thread_name_prefix="memory")
+
+    @staticmethod
+    def _clean(history: list) -> List[dict]:
+        return [{"role": m["role"], "content": m["content"]} for m in history
+                if m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)]
+
+    @staticmethod
+    def _prefix_hashes(messages: List[dict]) -> List[str]:
+        """ hashes[i] identifies messages[:i]; history only grows, so old prefixes keep their hash """
+        hashes = [""]
+        for message in messages:
+            digest = hashlib.sha256(f"{hashes[-1]}\x00{message['role']}\x00{message['content']}".encode("utf-8"))
+            hashes.append(digest.hexdigest())
+        return hashes
+
+    def _latest_summary(self, hashes: List[str]) -> Tuple[int, str]:
+        """ Longest summarized prefix: (number of messages it covers, summary) """
+        with self._lock:
+            for covered in range(len(hashes) - 1, 0, -1):
+                summary = self._summaries.get(hashes[covered])
+                if summary is not None:
+                    self._summaries.move_to_end(hashes[covered])
+                    return covered, summary
+        return 0, ""
+
+    def _refresh(self, key: str, previous_summary: str, messages: List[dict]) -> None:
+        try:
+            summary = self.summarize(previous_summary, messages)
+            with self._lock:
+                self._summaries[key] = summary
+                while len(self._summaries) > MemoryConfig.CACHE_SIZE:
+                    self._summaries.popitem(last=False)
+        except Exception as e:
+            logger.warning(f"History summary refresh failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _schedule_refresh(self, key: str, previous_summary: str, messages: List[dict]) -> None:
+        with self._lock:
+            if key in self._pending or key in self._summaries:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._refresh, key, previous_summary, messages)
+
+    def bounded(self, history: list) -> List[dict]:
+        """ Summary (as a system message) plus recent messages, within the token budget """
+        messages = self._clean(history)
+        keep = self.recent_turns * 2
+        folded, recent = (messages[:-keep], messages[-keep:]) if keep else (messages, [])
+
+        summary = ""
+        unsummarized: List[dict] = []
+        if folded:
+            hashes = self._prefix_hashes(folded)
+            covered, summary = self._latest_summary(hashes)
+            unsummarized = folded[covered:]
+            if unsummarized:
+                self._schedule_refresh(hashes[-1], summary, unsummarized)
+
+        # Spend the budget newest-first: recent turns, then the summary, then unsummarized overflow
+        budget = self.token_budget
+        kept_recent: List[dict] = []
+        for message in reversed(recent):
+            cost = message_tokens(message)
+            if kept_recent and cost > budget:
+                break
+            kept_recent.insert(0, message)
+            budget -= cost
+
+        summary_message: List[dict] = []
+        if summary:
+            content = f"## Summary of the earlier conversation:\n{summary}"
+            if message_tokens({"content": content}) <= budget:
+                summary_message = [{"role": "system", "content": content}]
+                budget -= message_tokens(summary_message[0])
+
+        kept_overflow: List[dict] = []
+        if len(kept_recent) == len(recent):
+            for message in reversed(unsummarized):
+                cost = message_tokens(message)
+                if cost > budget:
+                    break
+                kept_overflow.insert(0, message)
+                budget -= cost
+
+        return summary_message + kept_overflow + kept_recent
+
+# Shared manager for the chat apps
+history_manager = HistoryManager()
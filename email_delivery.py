@@ -0,0 +1,267 @@
+# Email Delivery Layer
+# Pooled, non-blocking SendGrid delivery with bulk recipients and a persistent retry queue
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from sendgrid.helpers.mail import Mail, Email, Content, Personalization, To, Substitution
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Set
+from datetime import datetime
+import asyncio
+import httpx
+import json
+import logging
+import os
+import random
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class DeliveryConfig:
+    # SENDGRID_API_HOST / SENDGRID_API_KEY are read when the HTTP client is first built, so values
+    # from a .env file loaded by the entry point apply
+    API_HOST = "https://api.sendgrid.com"
+    MAX_RECIPIENTS_PER_REQUEST = 1000  # SendGrid personalizations limit per request
+    MAX_CONCURRENT_REQUESTS = 4
+    MAX_CONNECTIONS = 10
+    REQUEST_TIMEOUT = 30  # seconds
+    RETRY_QUEUE_PATH = "output/email_retry_queue.json"
+    MAX_ATTEMPTS = 6
+    BASE_BACKOFF = 30  # seconds
+    MAX_BACKOFF = 3600  # seconds
+    RETRY_POLL_INTERVAL = 15  # seconds
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# =============================================================================
+# DELIVERY MODELS
+# =============================================================================
+class Recipient(BaseModel):
+    email: str = Field(description="Recipient email address")
+    name: Optional[str] = Field(default=None, description="Recipient display name")
+    substitutions: Dict[str, str] = Field(default_factory=dict, description="Per-recipient substitution tags, e.g. {'-name-': 'Ada'}")
+
+class PendingEmail(BaseModel):
+    id: str = Field(description="Unique id of the queued send")
+    subject: str = Field(description="Email subject")
+    html_body: str = Field(description="HTML content of the email")
+    from_email: str = Field(description="Sender address")
+    recipients: List[Recipient] = Field(description="Recipients still waiting for delivery")
+    attempts: int = Field(default=0, description="Number of failed delivery attempts")
+    next_attempt_at: float = Field(default=0.0, description="Unix time of the next retry")
+    last_error: str = Field(default="", description="Error from the most recent attempt")
+    created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+class DeliveryError(Exception):
+    """ A send that failed; `retryable` tells whether it is worth queueing """
+
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+# =============================================================================
+# PERSISTENT RETRY QUEUE
+# =============================================================================
+class RetryQueue:
+    """ JSON-file backed queue of sends waiting for another attempt """
+
+    def __init__(self, path: str = DeliveryConfig.RETRY_QUEUE_PATH):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> List[PendingEmail]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [PendingEmail.model_validate(item) for item in json.load(f)]
+
+    def _save(self, items: List[PendingEmail]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([item.model_dump() for item in items], f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    async def push(self, item: PendingEmail) -> None:
+        async with self._lock:
+            items = [existing for existing in self._load() if existing.id != item.id]
+            items.append(item)
+            self._save(items)
+
+    async def due(self, now: Optional[float] = None) -> List[PendingEmail]:
+        """ Every item whose backoff has elapsed; items stay queued until removed or replaced """
+        now = time.time() if now is None else now
+        async with self._lock:
+            return [item for item in self._load() if item.next_attempt_at <= now]
+
+    async def remove(self, item_id: str) -> None:
+        async with self._lock:
+            items = self._load()
+            remaining = [item for item in items if item.id != item_id]
+            if len(remaining) != len(items):
+                self._save(remaining)
+
+    async def size(self) -> int:
+        async with self._lock:
+            return len(self._load())
+
+def backoff_delay(attempts: int) -> float:
+    """ Exponential backoff with full jitter on the upper half """
+    delay = min(DeliveryConfig.MAX_BACKOFF, DeliveryConfig.BASE_BACKOFF * (2 ** max(attempts - 1, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+# =============================================================================
+# SENDGRID DELIVERY SERVICE
+# =============================================================================
+class EmailDelivery:
+    """ Sends email through one shared, keep-alive HTTP client to the SendGrid v3 API """
+
+    def __init__(self, api_key: Optional[str] = None, host: Optional[str] = None,
+                 retry_queue: Optional[RetryQueue] = None):
+        self.api_key = api_key
+        self.host = host
+        self.retry_queue = retry_queue or RetryQueue()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._retrying: Set[str] = set()  # queued ids with a retry in progress
+        self._semaphore = asyncio.Semaphore(DeliveryConfig.MAX_CONCURRENT_REQUESTS)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            api_key = self.api_key or os.environ.get("SENDGRID_API_KEY")
+            host = self.host or os.environ.get("SENDGRID_API_HOST", DeliveryConfig.API_HOST)
+            self._client = httpx.AsyncClient(
+                base_url=host.rstrip("/"),
+                headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                timeout=DeliveryConfig.REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=DeliveryConfig.MAX_CONNECTIONS,
+                                    max_keepalive_connections=DeliveryConfig.MAX_CONNECTIONS),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def build_mail(subject: str, html_body: str, from_email: str, recipients: List[Recipient]) -> Dict:
+        """ Build one SendGrid request with a personalization per recipient """
+        mail = Mail(from_email=Email(from_email), subject=subject)
+        mail.add_content(Content("text/html", html_body))
+        for recipient in recipients:
+            personalization = Personalization()
+            personalization.add_to(To(recipient.email, recipient.name))
+            for tag, value in recipient.substitutions.items():
+                personalization.add_substitution(Substitution(tag, value))
+            mail.add_personalization(personalization)
+        return mail.get()
+
+    async def _post(self, payload: Dict) -> None:
+        async with self._semaphore:
+            try:
+                response = await self.client.post("/v3/mail/send", json=payload)
+            except httpx.HTTPError as e:
+                raise DeliveryError(f"SendGrid request failed: {e}", retryable=True) from e
+
+        if response.status_code not in (200, 201, 202):
+            raise DeliveryError(
+                f"Email failed with status {response.status_code}: {response.text[:200]}",
+                retryable=response.status_code in RETRYABLE_STATUS_CODES,
+            )
+
+    async def _send_batch(self, subject: str, html_body: str, from_email: str, recipients: List[Recipient],
+                          attempts: int = 0, item_id: Optional[str] = None) -> Dict[str, str]:
+        """ Send one batch; `item_id` is the retry queue entry being retried, if any.
+
+        A queued entry is only removed after a successful send or a permanent failure, and a
+        further retry replaces it in place, so an interrupted retry never loses the email.
+        """
+        try:
+            await self._post(self.build_mail(subject, html_body, from_email, recipients))
+            if item_id is not None:
+                await self.retry_queue.remove(item_id)
+            return {"status": "success", "message": f"Email sent to {len(recipients)} recipient(s)"}
+        except DeliveryError as e:
+            if not e.retryable or attempts + 1 >= DeliveryConfig.MAX_ATTEMPTS:
+                logger.error(f"❌ Email delivery failed permanently: {e}")
+                if item_id is not None:
+                    await self.retry_queue.remove(item_id)
+                return {"status": "error", "message": str(e)}
+
+            pending = PendingEmail(
+                id=item_id or uuid.uuid4().hex,
+                subject=subject,
+                html_body=html_body,
+                from_email=from_email,
+                recipients=recipients,
+                attempts=attempts + 1,
+                next_attempt_at=time.time() + backoff_delay(attempts + 1),
+                last_error=str(e),
+            )
+            await self.retry_queue.push(pending)
+            logger.warning(f"⏳ Email delivery queued for retry ({pending.attempts}/{DeliveryConfig.MAX_ATTEMPTS}): {e}")
+            return {"status": "queued", "message": str(e)}
+
+    async def send(self, subject: str, html_body: str, recipients: List[Recipient],
+                   from_email: Optional[str] = None) -> Dict[str, str]:
+        """ Send to any number of recipients, chunked into bulk personalized requests """
+        if not recipients:
+            return {"status": "error", "message": "No email recipients given"}
+        from_email = from_email or os.environ.get("FROM_EMAIL", "research@example.com")
+        size = DeliveryConfig.MAX_RECIPIENTS_PER_REQUEST
+        batches = [recipients[i:i + size] for i in range(0, len(recipients), size)]
+
+        results = await asyncio.gather(*[
+            self._send_batch(subject, html_body, from_email, batch) for batch in batches
+        ])
+
+        statuses = {result["status"] for result in results}
+        if statuses == {"success"}:
+            return {"status": "success", "message": f"Email sent to {len(recipients)} recipient(s)"}
+        status = "error" if "error" in statuses else "queued"
+        return {"status": status, "message": "; ".join(r["message"] for r in results if r["status"] != "success")}
+
+    async def flush_retry_queue(self) -> int:
+        """ Retry every queued send whose backoff has elapsed; returns how many were delivered """
+        due = [item for item in await self.retry_queue.due() if item.id not in self._retrying]
+        self._retrying.update(item.id for item in due)
+        try:
+            results = await asyncio.gather(*[
+                self._send_batch(item.subject, item.html_body, item.from_email, item.recipients,
+                                 item.attempts, item_id=item.id)
+                for item in due
+            ], return_exceptions=True)
+        finally:
+            self._retrying.difference_update(item.id for item in due)
+
+        for item, result in zip(due, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Retry of queued email {item.id} failed, keeping it queued: {str(result)}")
+        delivered = sum(1 for result in results if isinstance(result, dict) and result["status"] == "success")
+        if due:
+            logger.info(f"📬 Retried {len(due)} queued email(s), {delivered} delivered")
+        return delivered
+
+    async def run_retry_worker(self, interval: float = DeliveryConfig.RETRY_POLL_INTERVAL) -> None:
+        """ Background loop that keeps draining the retry queue """
+        while True:
+            try:
+                await self.flush_retry_queue()
+            except Exception as e:
+                logger.error(f"Retry worker error: {str(e)}")
+            await asyncio.sleep(interval)
+
+def parse_recipients(recipient_emails: Optional[str]) -> List[Recipient]:
+    """ Turn a comma/semicolon separated address list into recipients """
+    raw = recipient_emails or os.environ.get("TO_EMAIL", "recipient@example.com")
+    addresses = [address.strip() for address in raw.replace(";", ",").split(",")]
+    return [Recipient(email=address) for address in addresses if address]
+
+# Shared delivery instance reused across every send
+email_delivery = EmailDelivery()
@@ -0,0 +1,51 @@
+# Embeddings
+# Batched OpenAI embeddings and vectorized cosine similarity shared by the agents
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from llm_gateway import openai_client, async_openai_client
+from openai import OpenAI, AsyncOpenAI
+from typing import List, Optional
+import numpy as np
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+MAX_BATCH_SIZE = 256  # inputs per embeddings request
+
+def _get_client() -> OpenAI:
+    return openai_client()
+
+def _get_async_client() -> AsyncOpenAI:
+    return async_openai_client()
+
+# =============================================================================
+# EMBEDDING HELPERS
+# =============================================================================
+def _normalize(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def embed_texts(texts: List[str], client: Optional[OpenAI] = None, model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """ Embed texts in as few requests as possible; returns unit-length rows """
+    client = client or _get_client()
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), MAX_BATCH_SIZE):
+        response = client.embeddings.create(model=model, input=texts[start:start + MAX_BATCH_SIZE])
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda d: d.index))
+    return _normalize(vectors)
+
+async def aembed_texts(texts: List[str], client: Optional[AsyncOpenAI] = None, model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """ Async version of embed_texts """
+    client = client or _get_async_client()
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), MAX_BATCH_SIZE):
+        response = await client.embeddings.create(model=model, input=texts[start:start + MAX_BATCH_SIZE])
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda d: d.index))
+    return _normalize(vectors)
+
+def cosine_scores(query_vector: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """ Cosine similarity of one unit vector against every row of a unit-row matrix """
+    if matrix.size == 0:
+        return np.zeros(0, dtype=np.float32)
+    return matrix @ query_vector
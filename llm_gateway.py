@@ -0,0 +1,433 @@
+# LLM Gateway
+# One shared HTTP layer for every OpenAI-backed entry point: pooled connections, an adaptive
+# rate limiter that backs off on 429s, coalescing of identical in-flight requests and a
+# record/replay cassette for deterministic offline runs.
+#
+# Every client (OpenAI, AsyncOpenAI, the agents SDK and crewai's litellm) is built on the
+# gateway's httpx clients, so all of this happens at the transport level.
+#
+# Modes (LLM_GATEWAY_MODE):
+#   live    - normal traffic (default)
+#   record  - live traffic, every response saved to the cassette (LLM_GATEWAY_CASSETTE)
+#   replay  - no network; responses served from the cassette
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from openai import OpenAI, AsyncOpenAI
+from typing import Dict, Optional, Tuple
+import asyncio
+import base64
+import hashlib
+import httpx
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class GatewayConfig:
+    # Defaults; LLM_GATEWAY_MODE / LLM_GATEWAY_CASSETTE / LLM_GATEWAY_REPLAY_LATENCY are read when
+    # the gateway is created, so values from a .env file loaded by the entry point apply
+    MODE = "live"
+    CASSETTE_PATH = "output/cassettes/default.json"
+    MAX_CONNECTIONS = 100
+    REQUEST_TIMEOUT = 120  # seconds
+    INITIAL_RATE = 20.0  # requests per second
+    BURST = 40  # requests allowed at once before pacing starts
+    MIN_RATE = 0.5
+    MAX_RATE = 200.0
+    RATE_INCREASE = 0.5  # requests per second added after each success
+    RATE_DECREASE = 0.5  # rate multiplier after each 429
+    MAX_THROTTLE_RETRIES = 5
+    # Fire-and-forget endpoints that are never recorded and are answered locally in replay
+    UNRECORDED_PATHS = ("/v1/traces/ingest",)
+
+MODES = ("live", "record", "replay")
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# Response parts kept for coalescing and cassettes: (status, headers, body, elapsed seconds)
+ResponseParts = Tuple[int, Dict[str, str], bytes, float]
+
+# =============================================================================
+# ADAPTIVE RATE LIMITER
+# =============================================================================
+class AdaptiveRateLimiter:
+    """ Process-wide token bucket shared by sync and async traffic.
+
+    Up to `burst` requests go out at once, then they are paced at `rate` per second. Each
+    429 multiplies the rate down, empties the bucket and honours Retry-After; each success
+    adds a little rate back (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, rate: float = GatewayConfig.INITIAL_RATE, burst: float = GatewayConfig.BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """ Take a token (possibly borrowing ahead) and return how long to wait before sending """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(GatewayConfig.MAX_RATE, self.rate + GatewayConfig.RATE_INCREASE)
+
+    def on_throttle(self, retry_after: Optional[float]) -> float:
+        """ Slow down after a 429; returns the pause before the retry """
+        with self._lock:
+            self.rate = max(GatewayConfig.MIN_RATE, self.rate * GatewayConfig.RATE_DECREASE)
+            self._tokens = min(self._tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        logger.warning(f"⏳ Rate limited; slowing to {self.rate:.1f} req/s, retrying in {pause:.1f}s")
+        return pause
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    for header in ("retry-after-ms", "retry-after"):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return float(value) / (1000 if header == "retry-after-ms" else 1)
+            except ValueError:
+                pass
+    return None
+
+# =============================================================================
+# CASSETTE
+# =============================================================================
+class Cassette:
+    """ JSON file of recorded responses keyed by method, path and canonical request body """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(request: httpx.Request) -> str:
+        body = request.content
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+        except ValueError:
+            pass
+        raw = b"\x00".join([request.method.encode(), request.url.raw_path, body])
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, key: str) -> Optional[ResponseParts]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        body = base64.b64decode(entry["body"]) if entry["encoding"] == "base64" else entry["body"].encode("utf-8")
+        return entry["status"], entry["headers"], body, entry.get("elapsed", 0.0)
+
+    def put(self, key: str, request: httpx.Request, parts: ResponseParts) -> None:
+        status, headers, body, elapsed = parts
+        try:
+            stored, encoding = body.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            stored, encoding = base64.b64encode(body).decode("ascii"), "base64"
+        with self._lock:
+            self.entries[key] = {
+                "request": f"{request.method} {request.url.path}",
+                "status": status, "headers": headers, "body": stored, "encoding": encoding,
+                "elapsed": round(elapsed, 4),
+            }
+            self._save()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+# =============================================================================
+# REQUEST HELPERS
+# =============================================================================
+def is_streaming(request: httpx.Request) -> bool:
+    try:
+        return bool(json.loads(request.content).get("stream"))
+    except (ValueError, AttributeError):
+        return False
+
+def to_response(parts: ResponseParts, request: httpx.Request) -> httpx.Response:
+    status, headers, body, _ = parts
+    return httpx.Response(status, headers=headers, content=body, request=request)
+
+def clean_headers(response: httpx.Response) -> Dict[str, str]:
+    """ Headers safe to replay with an already-decoded body """
+    return {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+
+def mark_retries_done(response: httpx.Response, limiter: AdaptiveRateLimiter) -> None:
+    """ Record a success, or tell the OpenAI SDK not to retry a 429 the gateway already retried """
+    if response.status_code == 429:
+        # Only one layer retries throttling; the SDK still retries 5xx and connection errors
+        response.headers["x-should-retry"] = "false"
+    else:
+        limiter.on_success()
+
+def cassette_miss(request: httpx.Request, key: str) -> ResponseParts:
+    # 404 rather than 5xx so the OpenAI SDK fails immediately instead of retrying
+    body = json.dumps({"error": {
+        "message": f"llm_gateway replay: no cassette entry for {request.method} {request.url.path} ({key[:12]})",
+        "type": "cassette_miss",
+    }}).encode("utf-8")
+    return 404, {"content-type": "application/json"}, body, 0.0
+
+# =============================================================================
+# TRANSPORTS
+# =============================================================================
+class GatewayTransport(httpx.BaseTransport):
+    """ Synchronous transport: replay, coalescing, rate limiting, 429 retries and recording """
+
+    def __init__(self, gateway: "LLMGateway"):
+        self.gateway = gateway
+        self._inner = httpx.HTTPTransport(limits=gateway.limits)
+        self._in_flight: Dict[str, Tuple[threading.Event, dict]] = {}
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        gateway = self.gateway
+        if request.url.path in GatewayConfig.UNRECORDED_PATHS:
+            if gateway.mode == "replay":
+                return httpx.Response(204, request=request)
+            return self._inner.handle_request(request)
+
+        key = Cassette.key(request)
+        if gateway.mode == "replay":
+            parts = gateway.cassette.get(key) or cassette_miss(request, key)
+            if gateway.replay_latency and parts[3]:
+                time.sleep(parts[3])
+            return to_response(parts, request)
+
+        if is_streaming(request) and gateway.mode == "live":
+            # Streams pass straight through so tokens are not held back
+            return self._send_live(request)
+
+        # Identical concurrent requests share one upstream call
+        with self._lock:
+            waiting = self._in_flight.get(key)
+            if waiting is None:
+                self._in_flight[key] = (threading.Event(), {})
+        if waiting is not None:
+            event, holder = waiting
+            event.wait()
+            if "error" in holder:
+                raise holder["error"]
+            return to_response(holder["parts"], request)
+
+        event, holder = self._in_flight[key]
+        try:
+            response = self._send_live(request)
+            start = time.monotonic()
+            body = response.read()
+            response.close()
+            elapsed = response.extensions["gateway_elapsed"] + (time.monotonic() - start)
+            parts = (response.status_code, clean_headers(response), body, elapsed)
+            holder["parts"] = parts
+            if gateway.mode == "record" and response.status_code < 500:
+                gateway.cassette.put(key, request, parts)
+            return to_response(parts, request)
+        except Exception as e:
+            holder["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            event.set()
+
+    def _send_live(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.gateway.limiter
+        for attempt in range(GatewayConfig.MAX_THROTTLE_RETRIES + 1):
+            limiter.acquire()
+            start = time.monotonic()
+            response = self._inner.handle_request(request)
+            if response.status_code != 429 or attempt == GatewayConfig.MAX_THROTTLE_RETRIES:
+                mark_retries_done(response, limiter)
+                response.extensions["gateway_elapsed"] = time.monotonic() - start
+                return response
+            response.close()
+            limiter.on_throttle(retry_after_seconds(response))  # the next acquire() waits out the pause
+        raise RuntimeError("unreachable")
+
+    def close(self) -> None:
+        self._inner.close()
+
+class AsyncGatewayTransport(httpx.AsyncBaseTransport):
+    """ Asynchronous counterpart of GatewayTransport """
+
+    def __init__(self, gateway: "LLMGateway"):
+        self.gateway = gateway
+        self._inner = httpx.AsyncHTTPTransport(limits=gateway.limits)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        gateway = self.gateway
+        if request.url.path in GatewayConfig.UNRECORDED_PATHS:
+            if gateway.mode == "replay":
+                return httpx.Response(204, request=request)
+            return await self._inner.handle_async_request(request)
+
+        key = Cassette.key(request)
+        if gateway.mode == "replay":
+            parts = gateway.cassette.get(key) or cassette_miss(request, key)
+            if gateway.replay_latency and parts[3]:
+                await asyncio.sleep(parts[3])
+            return to_response(parts, request)
+
+        if is_streaming(request) and gateway.mode == "live":
+            return await self._send_live(request)
+
+        # Identical concurrent requests share one upstream call, run as its own task so that
+        # cancelling any one caller (e.g. a client disconnect) never cancels the others
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, request))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return to_response(await asyncio.shield(task), request)
+
+    async def _fetch(self, key: str, request: httpx.Request) -> ResponseParts:
+        response = await self._send_live(request)
+        start = time.monotonic()
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        elapsed = response.extensions["gateway_elapsed"] + (time.monotonic() - start)
+        parts = (response.status_code, clean_headers(response), body, elapsed)
+        if self.gateway.mode == "record" and response.status_code < 500:
+            self.gateway.cassette.put(key, request, parts)
+        return parts
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved in case every caller was cancelled
+
+    async def _send_live(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.gateway.limiter
+        for attempt in range(GatewayConfig.MAX_THROTTLE_RETRIES + 1):
+            await limiter.acquire_async()
+            start = time.monotonic()
+            response = await self._inner.handle_async_request(request)
+            if response.status_code != 429 or attempt == GatewayConfig.MAX_THROTTLE_RETRIES:
+                mark_retries_done(response, limiter)
+                response.extensions["gateway_elapsed"] = time.monotonic() - start
+                return response
+            await response.aclose()
+            limiter.on_throttle(retry_after_seconds(response))  # the next acquire_async() waits out the pause
+        raise RuntimeError("unreachable")
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+# =============================================================================
+# GATEWAY
+# =============================================================================
+class LLMGateway:
+    """ Owns the shared limiter, cassette and httpx clients, and hands out API clients built on them """
+
+    def __init__(self, mode: Optional[str] = None, cassette_path: Optional[str] = None,
+                 replay_latency: Optional[bool] = None):
+        mode = mode or os.getenv("LLM_GATEWAY_MODE", GatewayConfig.MODE)
+        cassette_path = cassette_path or os.getenv("LLM_GATEWAY_CASSETTE", GatewayConfig.CASSETTE_PATH)
+        if replay_latency is None:
+            # In replay, sleep for each recorded response's original latency (for benchmarks)
+            replay_latency = os.getenv("LLM_GATEWAY_REPLAY_LATENCY", "0") == "1"
+        if mode not in MODES:
+            raise ValueError(f"Unknown gateway mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.limits = httpx.Limits(max_connections=GatewayConfig.MAX_CONNECTIONS,
+                                   max_keepalive_connections=GatewayConfig.MAX_CONNECTIONS)
+        self.limiter = AdaptiveRateLimiter()
+        self.cassette = Cassette(cassette_path) if mode in ("record", "replay") else None
+        self.http_client = httpx.Client(transport=GatewayTransport(self), timeout=GatewayConfig.REQUEST_TIMEOUT)
+        self.async_http_client = httpx.AsyncClient(transport=AsyncGatewayTransport(self),
+                                                   timeout=GatewayConfig.REQUEST_TIMEOUT)
+        self._openai: Optional[OpenAI] = None
+        self._async_openai: Optional[AsyncOpenAI] = None
+        if mode != "live":
+            logger.info(f"📼 LLM gateway in {mode} mode using {cassette_path}")
+
+    def _api_key(self) -> Optional[str]:
+        # Replay needs no real key, but the SDK insists on one
+        return os.getenv("OPENAI_API_KEY") or ("replay" if self.mode == "replay" else None)
+
+    def openai_client(self) -> OpenAI:
+        if self._openai is None:
+            self._openai = OpenAI(api_key=self._api_key(), http_client=self.http_client)
+        return self._openai
+
+    def async_openai_client(self) -> AsyncOpenAI:
+        if self._async_openai is None:
+            self._async_openai = AsyncOpenAI(api_key=self._api_key(), http_client=self.async_http_client)
+        return self._async_openai
+
+    def install_agents_sdk(self) -> None:
+        """ Route the openai-agents Runner through the gateway """
+        from agents import set_default_openai_client
+        set_default_openai_client(self.async_openai_client())
+
+    def install_litellm(self) -> None:
+        """ Route litellm (used by crewai's LLM) through the gateway's pooled clients """
+        import litellm
+        litellm.client_session = self.http_client
+        litellm.aclient_session = self.async_http_client
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+def get_gateway() -> LLMGateway:
+    """ The process-wide gateway, created on first use after the environment is loaded """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+def configure_gateway(mode: str, cassette_path: Optional[str] = None,
+                      replay_latency: Optional[bool] = None) -> LLMGateway:
+    """ Replace the process-wide gateway, e.g. to switch a benchmark into record or replay """
+    global _gateway
+    with _gateway_lock:
+        _gateway = LLMGateway(mode, cassette_path, replay_latency)
+        return _gateway
+
+def openai_client() -> OpenAI:
+    return get_gateway().openai_client()
+
+def async_openai_client() -> AsyncOpenAI:
+    return get_gateway().async_openai_client()
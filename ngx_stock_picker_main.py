@@ -5,6 +5,7 @@ import os
 from datetime import datetime
 
 from stock_picker.crew import StockPicker
+from llm_gateway import get_gateway
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -18,6 +19,9 @@ def run():
         "current_date": str(datetime.now().date())
     }
 
+    # crewai's LLM calls go through litellm; point it at the gateway's pooled clients
+    get_gateway().install_litellm()
+
     try:
         # Create and run the crew
         result = StockPicker().crew().kickoff(inputs=inputs)
@@ -0,0 +1,143 @@
+# Persona Evaluation
+# Decide which chat turns get a quality check, run checks off the reply path and cache verdicts
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class EvaluationConfig:
+    # Share of ordinary turns audited in the background (0 disables, 1 audits every turn).
+    # EVAL_SAMPLE_RATE overrides it, read when a policy is created so a value from .env applies
+    SAMPLE_RATE = 0.2
+    # Turns matching any of these are evaluated before the turn ends and rerun if rejected
+    RISK_PATTERNS = [
+        r"\bpatent",
+        r"\b(salary|rate|price|pricing|fee|cost)s?\b",
+        r"\b(guarantee|promise|contract)\w*",
+        r"\b(password|confidential|secret)\w*",
+        r"\b(legal|lawyer|medical|diagnos)\w*",
+    ]
+    CACHE_SIZE = 1024
+    BACKGROUND_WORKERS = 4
+
+# Decisions returned by EvaluationPolicy.decide
+BLOCK = "block"  # evaluate now and rerun a rejected reply
+AUDIT = "audit"  # evaluate in the background; the verdict is logged and cached
+SKIP = "skip"
+
+# =============================================================================
+# SAMPLING AND RISK RULES
+# =============================================================================
+class EvaluationPolicy:
+    """ Chooses BLOCK for risky turns, AUDIT for a random sample of the rest, SKIP otherwise """
+
+    def __init__(self, sample_rate: Optional[float] = None,
+                 risk_patterns: Optional[List[str]] = None, rng: Optional[random.Random] = None):
+        if sample_rate is None:
+            sample_rate = float(os.getenv("EVAL_SAMPLE_RATE", EvaluationConfig.SAMPLE_RATE))
+        self.sample_rate = sample_rate
+        patterns = EvaluationConfig.RISK_PATTERNS if risk_patterns is None else risk_patterns
+        self.risk_rules = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self.rng = rng or random.Random()
+
+    def is_risky(self, message: str, reply: str = "") -> bool:
+        return any(rule.search(message) or rule.search(reply) for rule in self.risk_rules)
+
+    def decide(self, message: str, reply: str) -> str:
+        if self.is_risky(message, reply):
+            return BLOCK
+        if self.rng.random() < self.sample_rate:
+            return AUDIT
+        return SKIP
+
+# =============================================================================
+# VERDICT CACHE
+# =============================================================================
+class VerdictCache:
+    """ Thread-safe LRU of evaluation verdicts keyed by the (message, reply) pair """
+
+    def __init__(self, max_size: int = EvaluationConfig.CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(message: str, reply: str) -> str:
+        return hashlib.sha256(f"{message}\x00{reply}".encode("utf-8")).hexdigest()
+
+    def get(self, message: str, reply: str) -> Optional[Any]:
+        key = self.key(message, reply)
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, message: str, reply: str, verdict: Any) -> None:
+        key = self.key(message, reply)
+        with self._lock:
+            self._items[key] = verdict
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+# =============================================================================
+# EVALUATION RUNNER
+# =============================================================================
+class ResponseEvaluator:
+    """ Wraps an evaluate(reply, message, history) function with caching and background audits """
+
+    def __init__(self, evaluate: Callable[..., Any], policy: Optional[EvaluationPolicy] = None,
+                 cache: Optional[VerdictCache] = None):
+        self.evaluate = evaluate
+        self.policy = policy or EvaluationPolicy()
+        self.cache = cache or VerdictCache()
+        self._executor = ThreadPoolExecutor(max_workers=EvaluationConfig.BACKGROUND_WORKERS,
+                                            thread_name_prefix="evaluator")
+
+    def _evaluate_cached(self, reply: str, message: str, history: list) -> Any:
+        verdict = self.cache.get(message, reply)
+        if verdict is None:
+            verdict = self.evaluate(reply, message, history)
+            self.cache.put(message, reply, verdict)
+        return verdict
+
+    def _log_audit(self, future: Future) -> None:
+        try:
+            verdict = future.result()
+            if not verdict.is_acceptable:
+                logger.warning(f"Audited reply rejected: {verdict.feedback}")
+        except Exception as e:
+            logger.error(f"Background evaluation failed: {str(e)}")
+
+    def check(self, reply: str, message: str, history: list) -> Optional[Any]:
+        """ Return a verdict the caller must act on, or None if the reply can stand.
+
+        Cached verdicts are always honoured. Risky turns are evaluated inline; sampled turns
+        are evaluated on a worker thread so the turn ends as soon as the reply is complete.
+        """
+        cached = self.cache.get(message, reply)
+        if cached is not None:
+            return cached
+
+        decision = self.policy.decide(message, reply)
+        if decision == BLOCK:
+            return self._evaluate_cached(reply, message, history)
+        if decision == AUDIT:
+            history_snapshot = list(history)
+            self._executor.submit(self._evaluate_cached, reply, message, history_snapshot).add_done_callback(self._log_audit)
+        return None
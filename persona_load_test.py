@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# Persona Load Test
+# Drives the async persona server against a local OpenAI-compatible stub and reports turn latency percentiles
+#
+# Usage:
+#   python persona_load_test.py                       # 1, 10 and 100 concurrent sessions
+#   python persona_load_test.py --levels 1,50 --turns 3 --concurrency 8
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from openai import AsyncOpenAI
+from llm_gateway import GatewayConfig
+from persona_serving import AsyncPersonaChat, ConcurrencyGate, ServingConfig
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import hashlib
+import httpx
+import json
+import math
+import time
+
+# =============================================================================
+# LOCAL OPENAI-COMPATIBLE STUB
+# =============================================================================
+class StubOpenAIServer:
+    """ Minimal HTTP/1.1 keep-alive server answering /v1/chat/completions (streamed or not)
+    and /v1/embeddings with canned content after a configurable simulated model latency """
+
+    def __init__(self, first_token_delay: float = 0.3, token_delay: float = 0.01, reply_tokens: int = 40,
+                 embedding_dim: int = 64, host: str = "127.0.0.1", port: int = 0):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.reply_tokens = reply_tokens
+        self.embedding_dim = embedding_dim
+        self.host = host
+        self.port = port
+        self.requests_served = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> "StubOpenAIServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> "StubOpenAIServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, value = line.decode("latin-1").split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                payload = json.loads(body) if body else {}
+                self.requests_served += 1
+
+                if method == "POST" and path.endswith("/chat/completions"):
+                    if payload.get("stream"):
+                        await self._stream_chat(writer, payload)
+                    else:
+                        await self._send_json(writer, 200, await self._chat(payload))
+                elif method == "POST" and path.endswith("/embeddings"):
+                    await self._send_json(writer, 200, self._embeddings(payload))
+                else:
+                    await self._send_json(writer, 404, {"error": {"message": f"No stub for {method} {path}"}})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+
+    def _reply_words(self, payload: dict) -> List[str]:
+        last = next((m.get("content") or "" for m in reversed(payload.get("messages", [])) if m.get("role") == "user"), "")
+        return [f"stub-reply-to:{len(last)}"] + ["word"] * (self.reply_tokens - 1)
+
+    @staticmethod
+    def _usage(payload: dict, completion_tokens: int) -> dict:
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in payload.get("messages", [])) // 4
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    async def _chat(self, payload: dict) -> dict:
+        words = self._reply_words(payload)
+        await asyncio.sleep(self.first_token_delay + self.token_delay * len(words))
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                         "finish_reason": "stop"}],
+            "usage": self._usage(payload, len(words)),
+        }
+
+    async def _stream_chat(self, writer: asyncio.StreamWriter, payload: dict) -> None:
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+
+        async def send_event(data: str) -> None:
+            event = f"data: {data}\n\n".encode("utf-8")
+            writer.write(f"{len(event):x}\r\n".encode("latin-1") + event + b"\r\n")
+            await writer.drain()
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> str:
+            return json.dumps({
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        await asyncio.sleep(self.first_token_delay)
+        for i, word in enumerate(self._reply_words(payload)):
+            await send_event(chunk({"role": "assistant", "content": word if i == 0 else f" {word}"}))
+            await asyncio.sleep(self.token_delay)
+        await send_event(chunk({}, "stop"))
+        await send_event("[DONE]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _embeddings(self, payload: dict) -> dict:
+        inputs = payload.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for index, text in enumerate(inputs):
+            digest = hashlib.sha256(str(text).encode("utf-8")).digest()
+            vector = [(digest[i % len(digest)] - 127.5) / 127.5 for i in range(self.embedding_dim)]
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return {"object": "list", "data": data, "model": payload.get("model", "stub"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+# =============================================================================
+# LOAD TEST
+# =============================================================================
+def percentile(values: List[float], p: float) -> float:
+    """ Nearest-rank percentile """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def stub_messages(message: str, history: list) -> List[dict]:
+    return [{"role": "system", "content": "You are a persona answering questions about a career."}] + \
+        history + [{"role": "user", "content": message}]
+
+async def run_session(chat: AsyncPersonaChat, session_id: str, turns: int, results: Dict[str, list]) -> None:
+    history: List[dict] = []
+    for turn in range(turns):
+        message = f"Session {session_id} question {turn}: what is your experience?"
+        start = time.perf_counter()
+        first_token: Optional[float] = None
+        reply = ""
+        async for reply in chat.respond(message, history, session_id):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+
+        if reply == ServingConfig.BUSY_MESSAGE:
+            results["rejected"].append(elapsed)
+            continue
+        results["latency"].append(elapsed)
+        results["first_token"].append(first_token or elapsed)
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+
+async def run_level(client: AsyncOpenAI, sessions: int, turns: int, concurrency: Optional[int], max_waiting: int) -> dict:
+    chat = AsyncPersonaChat(stub_messages, client=client, gate=ConcurrencyGate(concurrency, max_waiting))
+    results: Dict[str, list] = {"latency": [], "first_token": [], "rejected": []}
+    start = time.perf_counter()
+    await asyncio.gather(*[run_session(chat, f"s{i}", turns, results) for i in range(sessions)])
+    wall = time.perf_counter() - start
+    latency = results["latency"]
+    return {
+        "sessions": sessions,
+        "turns": len(latency),
+        "rejected": len(results["rejected"]),
+        "p50": percentile(latency, 50),
+        "p95": percentile(latency, 95),
+        "p99": percentile(latency, 99),
+        "ttft_p50": percentile(results["first_token"], 50),
+        "throughput": len(latency) / wall if wall else 0.0,
+    }
+
+def print_table(rows: List[dict]) -> None:
+    header = f"{'sessions':>8} {'turns':>6} {'rejected':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'ttft p50':>9} {'turns/s':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['sessions']:>8} {row['turns']:>6} {row['rejected']:>8} {row['p50']:>8.3f} {row['p95']:>8.3f} "
+              f"{row['p99']:>8.3f} {row['ttft_p50']:>9.3f} {row['throughput']:>8.1f}")
+
+async def main(args: argparse.Namespace) -> List[dict]:
+    async with StubOpenAIServer(first_token_delay=args.first_token_delay, token_delay=args.token_delay,
+                                reply_tokens=args.reply_tokens) as server:
+        # One shared client with the gateway's pool size, as in the real async server. The gateway's
+        # rate limiter is left out on purpose: this measures the serving layer, not API quotas
+        client = AsyncOpenAI(base_url=server.base_url, api_key="stub", http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=GatewayConfig.MAX_CONNECTIONS,
+                                max_keepalive_connections=GatewayConfig.MAX_CONNECTIONS),
+        ))
+        rows = []
+        for sessions in args.levels:
+            rows.append(await run_level(client, sessions, args.turns, args.concurrency, args.max_waiting))
+        await client.close()
+
+    print_table(rows)
+    return rows
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the async persona chat server against a local stub")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 10, 100],
+                        help="comma-separated concurrent session counts (default: 1,10,100)")
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help=f"concurrent turn limit (default: PERSONA_CONCURRENCY or {ServingConfig.MAX_CONCURRENT_TURNS})")
+    parser.add_argument("--max-waiting", type=int, default=256, help="turns allowed to wait before rejection")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="stub seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub seconds between tokens")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="stub tokens per reply")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
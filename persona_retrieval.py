@@ -0,0 +1,141 @@
+# Persona Retrieval
+# Chunk the profile once, embed it into a local vector index and retrieve only what each turn needs
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from embeddings import embed_texts, cosine_scores
+from profile_ingest import Profile
+from functools import lru_cache
+from typing import List, Tuple
+import numpy as np
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class RetrievalConfig:
+    INDEX_DIR = ".cache/persona_index"
+    CHUNK_CHARS = 800
+    CHUNK_OVERLAP = 150
+    TOP_K = 4
+    QUERY_CACHE_SIZE = 256  # recent message embeddings kept so chat and rerun share one lookup
+    INDEX_VERSION = 2  # bump when chunking changes so cached indexes are rebuilt
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# =============================================================================
+# CHUNKING
+# =============================================================================
+def split_units(text: str, size: int) -> List[str]:
+    """ Break text into lines, then sentences, then word-aligned pieces, each at most `size` chars.
+
+    PDF text (e.g. a LinkedIn export) has line breaks but almost no blank lines, so lines are
+    the natural unit; only lines longer than a chunk are split further.
+    """
+    units: List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        for sentence in ([line] if len(line) <= size else SENTENCE_END.split(line)):
+            while len(sentence) > size:
+                cut = sentence.rfind(" ", 0, size + 1)
+                cut = cut if cut > 0 else size  # a single word longer than a chunk
+                units.append(sentence[:cut].rstrip())
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                units.append(sentence)
+    return units
+
+def _joined_length(units: List[str]) -> int:
+    return sum(len(unit) for unit in units) + max(len(units) - 1, 0)
+
+def chunk_text(text: str, size: int = RetrievalConfig.CHUNK_CHARS,
+               overlap: int = RetrievalConfig.CHUNK_OVERLAP) -> List[str]:
+    """ Pack whole lines and sentences into chunks of at most `size` characters. Each new chunk
+    starts with up to `overlap` characters of whole units from the end of the previous one, so
+    no sentence is cut mid-word and neighbouring context carries over """
+    chunks: List[str] = []
+    current: List[str] = []
+    for unit in split_units(text, size):
+        if current and _joined_length(current + [unit]) > size:
+            chunks.append("\n".join(current))
+            carried: List[str] = []
+            for previous in reversed(current):
+                if _joined_length([previous] + carried) > overlap:
+                    break
+                carried.insert(0, previous)
+            current = carried if _joined_length(carried + [unit]) <= size else []
+        current.append(unit)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+def profile_chunks(profile: Profile) -> List[str]:
+    """ Label chunks with their source so the model knows where an excerpt came from """
+    return ([f"[Summary]\n{chunk}" for chunk in chunk_text(profile.summary)] +
+            [f"[LinkedIn]\n{chunk}" for chunk in chunk_text(profile.linkedin)])
+
+# =============================================================================
+# VECTOR INDEX
+# =============================================================================
+class ProfileIndex:
+    """ In-memory index of profile chunks, persisted under .cache/persona_index/<fingerprint> """
+
+    def __init__(self, chunks: List[str], vectors: np.ndarray, fingerprint: str):
+        self.chunks = chunks
+        self.vectors = vectors
+        self.fingerprint = fingerprint
+        self.embed_query = lru_cache(maxsize=RetrievalConfig.QUERY_CACHE_SIZE)(self._embed_query_uncached)
+
+    @staticmethod
+    def _paths(fingerprint: str) -> Tuple[str, str]:
+        base = os.path.join(RetrievalConfig.INDEX_DIR, f"{fingerprint}-v{RetrievalConfig.INDEX_VERSION}")
+        return f"{base}.json", f"{base}.npy"
+
+    @classmethod
+    def build(cls, profile: Profile) -> "ProfileIndex":
+        """ Load the index for this profile version, embedding the chunks only if it is missing """
+        chunks_path, vectors_path = cls._paths(profile.fingerprint)
+        if os.path.exists(chunks_path) and os.path.exists(vectors_path):
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            return cls(chunks, np.load(vectors_path), profile.fingerprint)
+
+        chunks = profile_chunks(profile)
+        logger.info(f"🧩 Embedding {len(chunks)} profile chunks...")
+        vectors = embed_texts(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+
+        os.makedirs(RetrievalConfig.INDEX_DIR, exist_ok=True)
+        np.save(vectors_path, vectors)
+        with open(chunks_path, "w", encoding="utf-8") as f:
+            json.dump(chunks, f)
+        return cls(chunks, vectors, profile.fingerprint)
+
+    def _embed_query_uncached(self, text: str) -> np.ndarray:
+        return embed_texts([text])[0]
+
+    def search(self, query: str, k: int = RetrievalConfig.TOP_K) -> List[str]:
+        """ Return the k chunks most similar to the query, best first """
+        if not self.chunks:
+            return []
+        scores = cosine_scores(self.embed_query(query), self.vectors)
+        k = min(k, len(self.chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [self.chunks[i] for i in top[np.argsort(-scores[top])]]
+
+    def context_for(self, message: str, k: int = RetrievalConfig.TOP_K) -> str:
+        return "\n\n---\n\n".join(self.search(message, k))
+
+def build_retrieval_prompt(intro: str, context: str, name: str) -> str:
+    """ System prompt with only the retrieved excerpts instead of the whole profile """
+    system_prompt = intro
+    system_prompt += f"\n\n## Relevant excerpts from {name}'s summary and LinkedIn profile:\n{context}\n\n"
+    system_prompt += f"With this context, please chat with the user, always staying in character as {name}."
+    return system_prompt
@@ -0,0 +1,209 @@
+# Persona Serving
+# Async, multi-user serving for the persona chat apps with one pooled client and backpressure
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from llm_gateway import async_openai_client
+from openai import AsyncOpenAI
+from semantic_cache import SemanticCache
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+import asyncio
+import gradio as gr
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class ServingConfig:
+    MODEL = "gpt-4o-mini"
+    # Defaults; PERSONA_CONCURRENCY / PERSONA_MAX_WAITING are read when a gate is created,
+    # so values from a .env file loaded by the app apply
+    MAX_CONCURRENT_TURNS = 16
+    MAX_WAITING_TURNS = 64  # beyond this, new turns are turned away
+    SESSION_TTL = 3600  # seconds of inactivity before a session's state is dropped
+    BUSY_MESSAGE = "I'm getting a lot of visitors right now - please try again in a moment."
+
+def get_async_client() -> AsyncOpenAI:
+    """ The gateway's AsyncOpenAI client: one pooled, rate-limited connection set for the whole process """
+    return async_openai_client()
+
+# =============================================================================
+# BACKPRESSURE
+# =============================================================================
+class ServerBusy(Exception):
+    """ Raised when the waiting line for a turn slot is already full """
+
+class ConcurrencyGate:
+    """ Limits concurrent turns and bounds how many may wait, so overload fails fast """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_waiting: Optional[int] = None):
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv("PERSONA_CONCURRENCY", ServingConfig.MAX_CONCURRENT_TURNS))
+        if max_waiting is None:
+            max_waiting = int(os.getenv("PERSONA_MAX_WAITING", ServingConfig.MAX_WAITING_TURNS))
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+
+    async def __aenter__(self) -> "ConcurrencyGate":
+        if self.waiting >= self.max_waiting and self._semaphore.locked():
+            raise ServerBusy()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+# =============================================================================
+# PER-SESSION STATE
+# =============================================================================
+class SessionState:
+    """ State owned by one visitor's session; the lock keeps their turns in order """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+class SessionStore:
+    def __init__(self, ttl: float = ServingConfig.SESSION_TTL):
+        self.ttl = ttl
+        self._sessions: Dict[str, SessionState] = {}
+
+    def get(self, session_id: str) -> SessionState:
+        now = time.monotonic()
+        for stale_id in [sid for sid, s in self._sessions.items() if now - s.last_seen > self.ttl and not s.lock.locked()]:
+            del self._sessions[stale_id]
+        session = self._sessions.setdefault(session_id, SessionState(session_id))
+        session.last_seen = now
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+# =============================================================================
+# ASYNC CHAT HANDLER
+# =============================================================================
+class AsyncPersonaChat:
+    """ Streaming async chat handler shared by the persona apps.
+
+    build_messages(message, history) returns the OpenAI message list for a turn and
+    may block (e.g. on retrieval), so it runs in a worker thread. Tool calls, if any,
+    run concurrently in threads. after_reply(reply, message, history) may return a
+    replacement reply, e.g. after a failed evaluation.
+
+    With an answer_cache, repeat questions are answered from it without taking a slot
+    at the gate, and final replies are stored unless a tool in private_tools was used.
+    """
+
+    def __init__(self, build_messages: Callable[[str, list], List[dict]],
+                 tools: Optional[List[dict]] = None,
+                 run_tool_call: Optional[Callable[[dict], dict]] = None,
+                 after_reply: Optional[Callable[[str, str, list], Optional[str]]] = None,
+                 client: Optional[AsyncOpenAI] = None, model: str = ServingConfig.MODEL,
+                 gate: Optional[ConcurrencyGate] = None, sessions: Optional[SessionStore] = None,
+                 answer_cache: Optional[SemanticCache] = None, private_tools: Iterable[str] = ()):
+        self.build_messages = build_messages
+        self.tools = tools
+        self.run_tool_call = run_tool_call
+        self.after_reply = after_reply
+        self.client = client or get_async_client()
+        self.model = model
+        self.gate = gate or ConcurrencyGate()
+        self.sessions = sessions or SessionStore()
+        self.answer_cache = answer_cache
+        self.private_tools = set(private_tools)
+
+    async def _stream_turn(self, messages: List[dict], tools_used: Set[str]) -> AsyncIterator[str]:
+        while True:
+            kwargs = {"tools": self.tools} if self.tools else {}
+            stream = await self.client.chat.completions.create(
+                model=self.model, messages=messages, stream=True, **kwargs
+            )
+
+            reply = ""
+            tool_calls: Dict[int, dict] = {}
+            finish_reason = None
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta.content:
+                    reply += choice.delta.content
+                    yield reply
+                for call in choice.delta.tool_calls or []:
+                    entry = tool_calls.setdefault(call.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                    if call.id:
+                        entry["id"] = call.id
+                    if call.function and call.function.name:
+                        entry["function"]["name"] += call.function.name
+                    if call.function and call.function.arguments:
+                        entry["function"]["arguments"] += call.function.arguments
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+
+            if finish_reason != "tool_calls" or self.run_tool_call is None:
+                return
+
+            calls = [tool_calls[index] for index in sorted(tool_calls)]
+            tools_used.update(call["function"]["name"] for call in calls)
+            messages.append({"role": "assistant", "content": reply or None, "tool_calls": calls})
+            results = await asyncio.gather(*[asyncio.to_thread(self.run_tool_call, call) for call in calls])
+            messages.extend(results)
+
+    async def respond(self, message: str, history: list, session_id: str = "default") -> AsyncIterator[str]:
+        """ Yield the growing reply for one turn of one session """
+        session = self.sessions.get(session_id)
+        try:
+            async with session.lock:
+                if self.answer_cache is not None:
+                    cached = await asyncio.to_thread(self.answer_cache.lookup, message, history)
+                    if cached is not None:
+                        yield cached
+                        return
+
+                async with self.gate:
+                    messages = await asyncio.to_thread(self.build_messages, message, history)
+                    reply = ""
+                    tools_used: Set[str] = set()
+                    async for reply in self._stream_turn(messages, tools_used):
+                        yield reply
+                    if self.after_reply is not None:
+                        replacement = await asyncio.to_thread(self.after_reply, reply, message, history)
+                        if replacement is not None:
+                            reply = replacement
+                            yield replacement
+
+                if self.answer_cache is not None and not tools_used & self.private_tools:
+                    await asyncio.to_thread(self.answer_cache.store, message, history, reply)
+        except ServerBusy:
+            logger.warning(f"Turn rejected, {self.gate.waiting} already waiting")
+            yield ServingConfig.BUSY_MESSAGE
+
+    async def gradio_handler(self, message: str, history: list, request: gr.Request = None) -> AsyncIterator[str]:
+        session_id = getattr(request, "session_hash", None) or "default"
+        async for reply in self.respond(message, history, session_id):
+            yield reply
+
+def serve_async(handler: AsyncPersonaChat) -> None:
+    """ Launch the Gradio app on the async handler.
+
+    Gradio runs every turn immediately; the handler's ConcurrencyGate is the only limit,
+    so cache hits skip it and overload gets BUSY_MESSAGE (as in persona_load_test).
+    """
+    gr.ChatInterface(
+        handler.gradio_handler, type="messages", concurrency_limit=None,
+    ).queue(default_concurrency_limit=None).launch()
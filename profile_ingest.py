@@ -0,0 +1,129 @@
+# Profile Ingestion
+# Parallel, cached extraction of the LinkedIn PDF and summary used by the persona chat apps
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from concurrent.futures import ProcessPoolExecutor
+from pydantic import BaseModel, Field
+from pypdf import PdfReader
+from typing import Callable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class ProfileConfig:
+    CACHE_DIR = ".cache/profile"
+    PAGES_PER_WORKER = 2
+    MAX_WORKERS = os.cpu_count() or 1
+    PARALLEL_MIN_PAGES = 6  # below this, starting worker processes costs more than it saves
+
+class Profile(BaseModel):
+    summary: str = Field(description="Contents of summary.txt")
+    linkedin: str = Field(description="Text extracted from the LinkedIn PDF")
+    fingerprint: str = Field(description="Hash of both source files; changes whenever either file changes")
+
+class _CacheEntry(BaseModel):
+    path: str
+    mtime: float
+    size: int
+    sha256: str
+    text: str
+
+# =============================================================================
+# FILE FINGERPRINTS AND CACHE
+# =============================================================================
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _cache_path(path: str) -> str:
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(ProfileConfig.CACHE_DIR, f"{key}.json")
+
+def _read_cache(path: str) -> Optional[_CacheEntry]:
+    cache_path = _cache_path(path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return _CacheEntry.model_validate(json.load(f))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable profile cache {cache_path}: {str(e)}")
+        return None
+
+def _write_cache(entry: _CacheEntry) -> None:
+    cache_path = _cache_path(entry.path)
+    os.makedirs(ProfileConfig.CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry.model_dump(), f)
+    os.replace(tmp_path, cache_path)
+
+def cached_text(path: str, extract: Callable[[str], str]) -> Tuple[str, str]:
+    """ Return (text, sha256) for a file, calling `extract(path)` only when the file changed.
+
+    An unchanged mtime and size is trusted without re-hashing; a touched file is re-hashed,
+    and only a different hash triggers extraction.
+    """
+    stat = os.stat(path)
+    entry = _read_cache(path)
+    if entry and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+        return entry.text, entry.sha256
+
+    sha256 = file_sha256(path)
+    if entry and entry.sha256 == sha256:
+        text = entry.text
+    else:
+        logger.info(f"📄 Extracting {path}...")
+        text = extract(path)
+    _write_cache(_CacheEntry(path=path, mtime=stat.st_mtime, size=stat.st_size, sha256=sha256, text=text))
+    return text, sha256
+
+# =============================================================================
+# PDF EXTRACTION
+# =============================================================================
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """ Worker: extract text from pages [start, stop) of a PDF """
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def extract_pdf_text(path: str) -> str:
+    """ Extract every page's text, spreading page ranges across processes for long PDFs """
+    page_count = len(PdfReader(path).pages)
+    if page_count < ProfileConfig.PARALLEL_MIN_PAGES or ProfileConfig.MAX_WORKERS < 2:
+        return "".join(_extract_page_range(path, 0, page_count))
+
+    step = ProfileConfig.PAGES_PER_WORKER
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    with ProcessPoolExecutor(max_workers=min(ProfileConfig.MAX_WORKERS, len(ranges))) as executor:
+        chunks = executor.map(_extract_page_range, [path] * len(ranges),
+                              [start for start, _ in ranges], [stop for _, stop in ranges])
+        return "".join(text for chunk in chunks for text in chunk)
+
+def _read_text_file(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+# =============================================================================
+# PUBLIC API
+# =============================================================================
+def load_profile(pdf_path: str, summary_path: str) -> Profile:
+    """ Load the persona profile, skipping extraction entirely when both files are unchanged.
+
+    Call this from under `if __name__ == "__main__":` - worker processes re-import the
+    main module on platforms that spawn them.
+    """
+    linkedin, pdf_hash = cached_text(pdf_path, extract_pdf_text)
+    summary, summary_hash = cached_text(summary_path, _read_text_file)
+    fingerprint = hashlib.sha256(f"{pdf_hash}:{summary_hash}".encode("utf-8")).hexdigest()[:16]
+    return Profile(summary=summary, linkedin=linkedin, fingerprint=fingerprint)
@@ -0,0 +1,88 @@
+# Push Notifier
+# Background Pushover delivery so notifications never hold up a chat turn
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from typing import Optional
+import atexit
+import logging
+import os
+import queue
+import threading
+import requests
+
+logger = logging.getLogger(__name__)
+
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+
+class PushConfig:
+    MAX_QUEUE_SIZE = 1000
+    REQUEST_TIMEOUT = 10  # seconds
+    MAX_ATTEMPTS = 3
+    SHUTDOWN_TIMEOUT = 5  # seconds spent draining the queue at exit
+
+# =============================================================================
+# BACKGROUND NOTIFIER
+# =============================================================================
+class PushNotifier:
+    """ Queues Pushover messages and sends them from one daemon thread over a pooled session """
+
+    def __init__(self, user: Optional[str] = None, token: Optional[str] = None, url: str = PUSHOVER_URL):
+        # Credentials fall back to the environment at send time, after any load_dotenv()
+        self.user = user
+        self.token = token
+        self.url = url
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=PushConfig.MAX_QUEUE_SIZE)
+        self._session = requests.Session()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def push(self, message: str) -> bool:
+        """ Enqueue a message and return immediately; False if the queue is full """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            logger.warning(f"Push queue full, dropping: {message[:80]}")
+            return False
+
+    def _ensure_worker(self) -> None:
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="push-notifier", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            message = self._queue.get()
+            try:
+                self._send(message)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, message: str) -> None:
+        payload = {
+            "user": self.user or os.getenv("PUSHOVER_USER"),
+            "token": self.token or os.getenv("PUSHOVER_TOKEN"),
+            "message": message,
+        }
+        for attempt in range(1, PushConfig.MAX_ATTEMPTS + 1):
+            try:
+                response = self._session.post(self.url, data=payload, timeout=PushConfig.REQUEST_TIMEOUT)
+                if response.status_code < 500:
+                    return
+            except requests.RequestException as e:
+                logger.warning(f"Push attempt {attempt} failed: {str(e)}")
+        logger.error(f"Push not delivered after {PushConfig.MAX_ATTEMPTS} attempts: {message[:80]}")
+
+    def flush(self, timeout: float = PushConfig.SHUTDOWN_TIMEOUT) -> None:
+        """ Wait up to `timeout` seconds for queued messages to be sent """
+        done = threading.Event()
+        threading.Thread(target=lambda: (self._queue.join(), done.set()), daemon=True).start()
+        done.wait(timeout)
+
+# Shared notifier; pending pushes get a short grace period at interpreter exit
+notifier = PushNotifier()
+atexit.register(notifier.flush)
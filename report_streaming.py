@@ -0,0 +1,206 @@
+# Report Streaming
+# Incremental JSON parsing of the writer's token stream so report fields surface as soon as they exist
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from typing import Any, List, Optional, Tuple
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class ReportStreamConfig:
+    DETAILED_REPORT_FILE = "detailed_report.md"  # written inside each query's run directory
+    # Fields announced as soon as they are complete; ReportData declares them ahead of
+    # detailed_report, and structured output follows declaration order
+    EARLY_FIELDS = ("title", "executive_summary", "key_findings")
+    # Field whose text is written to disk while it is still being generated
+    PROGRESSIVE_FIELD = "detailed_report"
+
+# Event kinds produced by ReportStreamParser.feed
+FIELD = "field"      # (FIELD, key, parsed value) once a top-level value is complete
+PARTIAL = "partial"  # (PARTIAL, key, new text) for string values still being generated
+
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+# =============================================================================
+# INCREMENTAL JSON PARSER
+# =============================================================================
+class ReportStreamParser:
+    """ Parses a top-level JSON object from arbitrary text chunks.
+
+    String values are decoded as they arrive and reported as PARTIAL events; every
+    top-level value is reported once as a FIELD event when its closing token is seen.
+    Nested values (lists, objects, numbers) are buffered and decoded with json.loads.
+    """
+
+    def __init__(self):
+        self._state = "before_object"
+        self._key_raw = ""
+        self._key: Optional[str] = None
+        self._string: List[str] = []
+        self._partial: List[str] = []
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[str] = None
+        self._raw_value: List[str] = []
+        self._depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        events: List[Tuple[str, str, Any]] = []
+        for char in chunk:
+            self._consume(char, events)
+        if self._partial:
+            events.append((PARTIAL, self._key, "".join(self._partial)))
+            self._partial = []
+        return events
+
+    def _consume(self, char: str, events: List[Tuple[str, str, Any]]) -> None:
+        state = self._state
+
+        if state == "before_object":
+            if char == "{":
+                self._state = "expect_key"
+        elif state == "expect_key":
+            if char == '"':
+                self._key_raw = ""
+                self._state = "in_key"
+            elif char == "}":
+                self._finish()
+        elif state == "in_key":
+            if self._escape is not None:
+                self._key_raw += char
+                self._escape = None
+            elif char == "\\":
+                self._key_raw += char
+                self._escape = ""
+            elif char == '"':
+                self._key = json.loads(f'"{self._key_raw}"')
+                self._state = "expect_colon"
+            else:
+                self._key_raw += char
+        elif state == "expect_colon":
+            if char == ":":
+                self._state = "expect_value"
+        elif state == "expect_value":
+            if char == '"':
+                self._string = []
+                self._state = "in_string"
+            elif not char.isspace():
+                self._raw_value = []
+                self._depth = 0
+                self._raw_in_string = False
+                self._raw_escape = False
+                self._state = "in_raw"
+                self._consume_raw(char, events)
+        elif state == "in_string":
+            self._consume_string(char, events)
+        elif state == "in_raw":
+            self._consume_raw(char, events)
+        elif state == "expect_comma":
+            if char == ",":
+                self._state = "expect_key"
+            elif char == "}":
+                self._finish()
+
+    def _emit_text(self, text: str) -> None:
+        if self._high_surrogate is not None:
+            text = (self._high_surrogate + text).encode("utf-16", "surrogatepass").decode("utf-16")
+            self._high_surrogate = None
+        elif len(text) == 1 and 0xD800 <= ord(text) <= 0xDBFF:
+            self._high_surrogate = text
+            return
+        self._string.append(text)
+        self._partial.append(text)
+
+    def _consume_string(self, char: str, events: List[Tuple[str, str, Any]]) -> None:
+        if self._escape is not None:
+            if self._escape == "" and char != "u":
+                self._emit_text(_SIMPLE_ESCAPES.get(char, char))
+                self._escape = None
+                return
+            self._escape += char
+            if len(self._escape) == 5:  # "u" plus four hex digits
+                self._emit_text(chr(int(self._escape[1:], 16)))
+                self._escape = None
+        elif char == "\\":
+            self._escape = ""
+        elif char == '"':
+            if self._partial:
+                events.append((PARTIAL, self._key, "".join(self._partial)))
+                self._partial = []
+            events.append((FIELD, self._key, "".join(self._string)))
+            self._state = "expect_comma"
+        else:
+            self._emit_text(char)
+
+    def _consume_raw(self, char: str, events: List[Tuple[str, str, Any]]) -> None:
+        if self._raw_in_string:
+            self._raw_value.append(char)
+            if self._raw_escape:
+                self._raw_escape = False
+            elif char == "\\":
+                self._raw_escape = True
+            elif char == '"':
+                self._raw_in_string = False
+            return
+
+        if self._depth == 0 and char in ",}":
+            # End of a scalar (number, true, false, null); the delimiter still belongs to the object
+            self._complete_raw(events)
+            self._consume(char, events)
+            return
+
+        self._raw_value.append(char)
+        if char == '"':
+            self._raw_in_string = True
+        elif char in "[{":
+            self._depth += 1
+        elif char in "]}":
+            self._depth -= 1
+            if self._depth == 0:
+                self._complete_raw(events)
+
+    def _complete_raw(self, events: List[Tuple[str, str, Any]]) -> None:
+        events.append((FIELD, self._key, json.loads("".join(self._raw_value).strip())))
+        self._state = "expect_comma"
+
+    def _finish(self) -> None:
+        self._state = "done"
+        self.done = True
+
+# =============================================================================
+# PROGRESSIVE REPORT WRITER
+# =============================================================================
+class ProgressiveReportFile:
+    """ Appends the detailed report to disk as text arrives, flushing every chunk """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def write(self, text: str) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(text)
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def log_report_field(key: str, value: Any) -> None:
+    """ Default handler for early report fields """
+    if isinstance(value, list):
+        logger.info(f"📌 {key}:\n" + "\n".join(f"  - {item}" for item in value))
+    else:
+        logger.info(f"📌 {key}: {value}")
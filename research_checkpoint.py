@@ -0,0 +1,79 @@
+# Research Checkpoints
+# Stage-level persistence so a research run can resume where it stopped
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from pydantic import TypeAdapter
+from typing import Any, Optional, Type
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class CheckpointConfig:
+    RUNS_DIR = "output/runs"
+    # Stages in execution order; forcing one stage recomputes it and every stage after it
+    STAGES = ("plan", "searches", "report", "email")
+
+def query_hash(query: str) -> str:
+    """ Stable run key for a query, ignoring surrounding and repeated whitespace """
+    normalized = " ".join(query.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+# =============================================================================
+# CHECKPOINT STORE
+# =============================================================================
+class ResearchCheckpoint:
+    """ Saves each stage's Pydantic output to output/runs/<query hash>/<stage>.json """
+
+    def __init__(self, query: str, runs_dir: str = CheckpointConfig.RUNS_DIR):
+        self.run_id = query_hash(query)
+        self.run_dir = os.path.join(runs_dir, self.run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+
+    def artifact_path(self, name: str) -> str:
+        """ Path for a non-stage file that belongs to this run, e.g. the streamed report """
+        return os.path.join(self.run_dir, name)
+
+    def _path(self, stage: str) -> str:
+        if stage not in CheckpointConfig.STAGES:
+            raise ValueError(f"Unknown stage '{stage}', expected one of {CheckpointConfig.STAGES}")
+        return os.path.join(self.run_dir, f"{stage}.json")
+
+    def load(self, stage: str, output_type: Type) -> Optional[Any]:
+        """ Return the saved output of a stage, or None if it is missing or unreadable """
+        path = self._path(stage)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = TypeAdapter(output_type).validate_json(f.read())
+            logger.info(f"♻️ Resuming from checkpoint: {stage} ({self.run_id})")
+            return value
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint {path}: {str(e)}")
+            return None
+
+    def save(self, stage: str, value: Any, output_type: Type) -> None:
+        """ Atomically write a stage's output so a crash never leaves a half-written file """
+        path = self._path(stage)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(TypeAdapter(output_type).dump_json(value, indent=2))
+        os.replace(tmp_path, path)
+
+    def invalidate_from(self, stage: str) -> None:
+        """ Drop the checkpoint for `stage` and every later stage """
+        start = CheckpointConfig.STAGES.index(stage) if stage in CheckpointConfig.STAGES else None
+        if start is None:
+            raise ValueError(f"Unknown stage '{stage}', expected one of {CheckpointConfig.STAGES}")
+        for later_stage in CheckpointConfig.STAGES[start:]:
+            path = self._path(later_stage)
+            if os.path.exists(path):
+                os.remove(path)
+        logger.info(f"🧹 Recomputing from stage '{stage}' ({self.run_id})")
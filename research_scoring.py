@@ -0,0 +1,68 @@
+# Research Scoring
+# Source extraction and embedding-based relevance scoring for search results
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from embeddings import aembed_texts, cosine_scores
+from typing import List
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class ScoringConfig:
+    MIN_RELEVANCE = 0.35  # results below this cosine similarity are dropped before writing
+    MIN_RESULTS_KEPT = 2  # never drop below this many results, however low they score
+
+# Bare URLs and markdown links; trailing punctuation is stripped afterwards
+URL_PATTERN = re.compile(r"https?://[^\s<>\"'\)\]]+")
+
+# =============================================================================
+# SOURCE EXTRACTION
+# =============================================================================
+def extract_sources(text: str) -> List[str]:
+    """ Return the unique URLs cited in a search summary, in order of appearance """
+    sources: List[str] = []
+    for match in URL_PATTERN.findall(text or ""):
+        url = match.rstrip(".,;:!?")
+        if url not in sources:
+            sources.append(url)
+    return sources
+
+# =============================================================================
+# RELEVANCE SCORING
+# =============================================================================
+async def score_results(query: str, results: List) -> List:
+    """ Fill in relevance_score on SearchResult objects (sources are extracted per search).
+
+    The query and every summary are embedded in a single batch and scored with one
+    matrix-vector product, so the cost is one embeddings request per run.
+    """
+    if not results:
+        return results
+
+    try:
+        vectors = await aembed_texts([query] + [result.summary for result in results])
+        scores = cosine_scores(vectors[0], vectors[1:])
+        for result, score in zip(results, scores):
+            result.relevance_score = round(float(max(0.0, min(1.0, score))), 4)
+    except Exception as e:
+        logger.warning(f"Relevance scoring failed, keeping existing scores: {str(e)}")
+
+    return results
+
+def filter_relevant(results: List, min_relevance: float = ScoringConfig.MIN_RELEVANCE,
+                    min_kept: int = ScoringConfig.MIN_RESULTS_KEPT) -> List:
+    """ Drop low-relevance results, best first, keeping at least `min_kept` """
+    ranked = sorted(results, key=lambda r: r.relevance_score, reverse=True)
+    kept = [r for r in ranked if r.relevance_score >= min_relevance]
+    if len(kept) < min_kept:
+        kept = ranked[:min_kept]
+    dropped = len(results) - len(kept)
+    if dropped:
+        logger.info(f"🧮 Dropped {dropped} low-relevance result(s) before writing")
+    return kept
@@ -0,0 +1,162 @@
+# Semantic Cache
+# Serve stored answers to questions that mean the same thing as one already answered
+
+# =============================================================================
+# IMPORTS AND SETUP
+# =============================================================================
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+class SemanticCacheConfig:
+    # Default; ANSWER_CACHE_THRESHOLD is read when a cache is created, so a value from .env applies
+    SIMILARITY_THRESHOLD = 0.92
+    MAX_ENTRIES = 500
+    # Only turns with at most this many prior messages are cached. The key is the message alone,
+    # and later turns ("tell me more") depend on context, so only opening turns qualify
+    MAX_HISTORY_MESSAGES = 0
+    CACHE_PATH = ".cache/semantic_answers.json"
+    STATS_LOG_EVERY = 50  # lookups between hit-rate log lines
+
+def normalize_question(text: str) -> str:
+    return re.sub(r"[^\w\s]", "", text.lower()).strip()
+
+# =============================================================================
+# SEMANTIC ANSWER CACHE
+# =============================================================================
+class SemanticCache:
+    """ LRU of (question embedding, answer) pairs tied to one version of the profile.
+
+    Lookups try an exact match on the normalized question first (no embedding needed),
+    then cosine similarity against every stored question in one matrix product.
+    """
+
+    def __init__(self, embed: Callable[[str], np.ndarray],
+                 threshold: Optional[float] = None,
+                 max_entries: int = SemanticCacheConfig.MAX_ENTRIES,
+                 path: Optional[str] = SemanticCacheConfig.CACHE_PATH):
+        self.embed = embed
+        if threshold is None:
+            threshold = float(os.getenv("ANSWER_CACHE_THRESHOLD", SemanticCacheConfig.SIMILARITY_THRESHOLD))
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path
+        self.fingerprint: Optional[str] = None
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()  # normalized question -> entry
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+
+    # -------------------------------------------------------------------------
+    # Profile versioning and persistence
+    # -------------------------------------------------------------------------
+    def reset_for(self, fingerprint: str) -> None:
+        """ Bind the cache to a profile version, loading saved answers only if they match it """
+        with self._lock:
+            self.fingerprint = fingerprint
+            self._entries.clear()
+            self._matrix = None
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        saved = json.load(f)
+                    if saved.get("fingerprint") == fingerprint:
+                        for entry in saved["entries"]:
+                            entry["vector"] = np.asarray(entry["vector"], dtype=np.float32)
+                            self._entries[entry["key"]] = entry
+                    else:
+                        logger.info("🧹 Profile changed, discarding cached answers")
+                except Exception as e:
+                    logger.warning(f"Ignoring unreadable answer cache {self.path}: {str(e)}")
+
+    def save(self) -> None:
+        if not self.path or self.fingerprint is None:
+            return
+        with self._lock:
+            entries = [{**entry, "vector": entry["vector"].tolist()} for entry in self._entries.values()]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+
+    # -------------------------------------------------------------------------
+    # Lookup and store
+    # -------------------------------------------------------------------------
+    def cacheable(self, history: list) -> bool:
+        return self.fingerprint is not None and len(history) <= SemanticCacheConfig.MAX_HISTORY_MESSAGES
+
+    def _similar(self, vector: np.ndarray) -> Optional[str]:
+        if not self._entries:
+            return None
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key]["vector"] for key in self._keys])
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._keys[best] if scores[best] >= self.threshold else None
+
+    def lookup(self, message: str, history: list) -> Optional[str]:
+        """ Return a stored answer for an equivalent question, or None """
+        if not self.cacheable(history):
+            return None
+        start = time.perf_counter()
+        key = normalize_question(message)
+
+        with self._lock:
+            entry_key = key if key in self._entries else None
+        if entry_key is None:
+            vector = self.embed(message)
+            with self._lock:
+                entry_key = self._similar(vector)
+
+        with self._lock:
+            if entry_key is None or entry_key not in self._entries:
+                self.misses += 1
+                answer = None
+            else:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                self.hit_seconds += time.perf_counter() - start
+                answer = self._entries[entry_key]["answer"]
+            lookups = self.hits + self.misses
+
+        if lookups % SemanticCacheConfig.STATS_LOG_EVERY == 0:
+            logger.info(f"📊 Answer cache: {self.stats()}")
+        return answer
+
+    def store(self, message: str, history: list, answer: str) -> None:
+        if not answer or not self.cacheable(history):
+            return
+        key = normalize_question(message)
+        vector = self.embed(message)
+        with self._lock:
+            self._entries[key] = {"key": key, "question": message, "answer": answer, "vector": vector}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "lookups": lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "avg_hit_ms": round(1000 * self.hit_seconds / self.hits, 2) if self.hits else 0.0,
+        }
@@ -0,0 +1,202 @@
+# Email Delivery Tests
+# Runs EmailDelivery against a local HTTP stand-in for the SendGrid v3 API
+
+from email_delivery import EmailDelivery, Recipient, RetryQueue, parse_recipients
+from typing import Dict, List, Optional
+import asyncio
+import json
+import pytest
+
+# =============================================================================
+# LOCAL SENDGRID STAND-IN
+# =============================================================================
+class SendGridStandIn:
+    """ Keep-alive HTTP server answering POST /v3/mail/send with scripted status codes (202 once exhausted) """
+
+    def __init__(self, statuses: Optional[List[int]] = None):
+        self.statuses = list(statuses or [])
+        self.requests: List[Dict] = []
+        self.port = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self) -> "SendGridStandIn":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, value = line.decode("latin-1").split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                self.requests.append({"method": method, "path": path, "headers": headers, "payload": json.loads(body)})
+
+                status = self.statuses.pop(0) if self.statuses else 202
+                data = b"" if status == 202 else json.dumps({"errors": [{"message": f"stand-in {status}"}]}).encode()
+                writer.write(f"HTTP/1.1 {status} Stand-in\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+def recipients(count: int) -> List[Recipient]:
+    return [Recipient(email=f"user{i}@example.com", substitutions={"-name-": f"User {i}"}) for i in range(count)]
+
+async def send_via(stand_in: SendGridStandIn, queue: RetryQueue, count: int = 1) -> Dict[str, str]:
+    delivery = EmailDelivery(api_key="test-key", host=stand_in.base_url, retry_queue=queue)
+    try:
+        return await delivery.send("Report", "<p>Hello -name-</p>", recipients(count), from_email="research@example.com")
+    finally:
+        await delivery.aclose()
+
+@pytest.fixture
+def queue(tmp_path) -> RetryQueue:
+    return RetryQueue(str(tmp_path / "retry_queue.json"))
+
+# =============================================================================
+# TESTS
+# =============================================================================
+def test_accepted_send_succeeds(queue):
+    async def scenario():
+        async with SendGridStandIn([202]) as stand_in:
+            result = await send_via(stand_in, queue)
+            return result, stand_in.requests
+
+    result, requests = asyncio.run(scenario())
+    assert result["status"] == "success"
+    assert len(requests) == 1
+    assert requests[0]["path"] == "/v3/mail/send"
+    assert requests[0]["headers"]["authorization"] == "Bearer test-key"
+    assert asyncio.run(queue.size()) == 0
+
+def test_recipients_above_limit_are_batched(queue):
+    async def scenario():
+        async with SendGridStandIn() as stand_in:
+            result = await send_via(stand_in, queue, count=2500)
+            return result, stand_in.requests
+
+    result, requests = asyncio.run(scenario())
+    assert result["status"] == "success"
+    sizes = sorted((len(r["payload"]["personalizations"]) for r in requests), reverse=True)
+    assert sizes == [1000, 1000, 500]
+    sent = {p["to"][0]["email"] for r in requests for p in r["payload"]["personalizations"]}
+    assert len(sent) == 2500
+    assert requests[0]["payload"]["personalizations"][0]["substitutions"]
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retryable_failure_is_queued(queue, status):
+    async def scenario():
+        async with SendGridStandIn([status]) as stand_in:
+            return await send_via(stand_in, queue, count=3)
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "queued"
+    queued = asyncio.run(queue.due(now=float("inf")))
+    assert len(queued) == 1
+    assert queued[0].attempts == 1
+    assert len(queued[0].recipients) == 3
+    assert str(status) in queued[0].last_error
+
+def test_permanent_failure_is_not_queued(queue):
+    async def scenario():
+        async with SendGridStandIn([400]) as stand_in:
+            return await send_via(stand_in, queue)
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "error"
+    assert "400" in result["message"]
+    assert asyncio.run(queue.size()) == 0
+
+def test_flush_delivers_due_item(queue):
+    async def scenario():
+        async with SendGridStandIn([503, 202]) as stand_in:
+            assert (await send_via(stand_in, queue))["status"] == "queued"
+
+            # Skip the backoff so the queued send is due now
+            item = (await queue.due(now=float("inf")))[0]
+            await queue.push(item.model_copy(update={"next_attempt_at": 0.0}))
+
+            delivery = EmailDelivery(api_key="test-key", host=stand_in.base_url, retry_queue=queue)
+            try:
+                delivered = await delivery.flush_retry_queue()
+            finally:
+                await delivery.aclose()
+            return delivered, stand_in.requests
+
+    delivered, requests = asyncio.run(scenario())
+    assert delivered == 1
+    assert len(requests) == 2
+    assert asyncio.run(queue.size()) == 0
+
+def test_credentials_are_read_when_the_client_is_built(queue, monkeypatch):
+    async def scenario():
+        async with SendGridStandIn() as stand_in:
+            delivery = EmailDelivery(retry_queue=queue)  # built before the environment is loaded
+            monkeypatch.setenv("SENDGRID_API_KEY", "from-dotenv")
+            monkeypatch.setenv("SENDGRID_API_HOST", stand_in.base_url)
+            try:
+                result = await delivery.send("Report", "<p>Hi</p>", recipients(1), from_email="research@example.com")
+            finally:
+                await delivery.aclose()
+            return result, stand_in.requests
+
+    result, requests = asyncio.run(scenario())
+    assert result["status"] == "success"
+    assert requests[0]["headers"]["authorization"] == "Bearer from-dotenv"
+
+def test_failed_retry_stays_queued_under_same_id(queue):
+    async def scenario():
+        async with SendGridStandIn([503, 503]) as stand_in:
+            await send_via(stand_in, queue)
+            item = (await queue.due(now=float("inf")))[0]
+            await queue.push(item.model_copy(update={"next_attempt_at": 0.0}))
+
+            delivery = EmailDelivery(api_key="test-key", host=stand_in.base_url, retry_queue=queue)
+            try:
+                delivered = await delivery.flush_retry_queue()
+            finally:
+                await delivery.aclose()
+            return item, delivered, await queue.due(now=float("inf"))
+
+    item, delivered, remaining = asyncio.run(scenario())
+    assert delivered == 0
+    assert [r.id for r in remaining] == [item.id]
+    assert remaining[0].attempts == 2
+
+def test_no_recipients_is_an_error(queue):
+    async def scenario():
+        async with SendGridStandIn() as stand_in:
+            delivery = EmailDelivery(api_key="test-key", host=stand_in.base_url, retry_queue=queue)
+            try:
+                result = await delivery.send("Report", "<p>Hi</p>", parse_recipients(" , "))
+            finally:
+                await delivery.aclose()
+            return result, stand_in.requests
+
+    result, requests = asyncio.run(scenario())
+    assert result["status"] == "error"
+    assert requests == []
+    assert asyncio.run(queue.size()) == 0
@@ -0,0 +1,41 @@
+# Persona Retrieval Tests
+# Chunking of PDF-style profile text
+
+from persona_retrieval import chunk_text, split_units
+
+# Shaped like pypdf output from a LinkedIn export: many short lines, no blank lines
+LINKEDIN_TEXT = "\n".join(
+    [f"Senior Engineer at Company {i}" if i % 3 == 0 else
+     f"Led the migration of service {i} to a streaming architecture. Cut costs by {i}% and latency by half."
+     for i in range(60)]
+)
+
+def test_chunks_respect_size_and_keep_words_whole():
+    chunks = chunk_text(LINKEDIN_TEXT, size=300, overlap=80)
+    words = set(LINKEDIN_TEXT.split())
+    assert len(chunks) > 5
+    for chunk in chunks:
+        assert len(chunk) <= 300
+        assert set(chunk.split()) <= words
+
+def test_every_line_lands_in_a_chunk():
+    chunks = chunk_text(LINKEDIN_TEXT, size=300, overlap=80)
+    for line in LINKEDIN_TEXT.splitlines():
+        assert any(line in chunk.splitlines() for chunk in chunks)
+
+def test_next_chunk_starts_with_whole_units_from_the_previous():
+    chunks = chunk_text(LINKEDIN_TEXT, size=300, overlap=120)
+    for previous, following in zip(chunks, chunks[1:]):
+        assert following.splitlines()[0] in previous.splitlines()
+
+def test_long_line_splits_on_sentences_then_words():
+    sentence = "This sentence is of moderate length and ends here."
+    line = " ".join([sentence] * 10) + " " + "word " * 100
+    units = split_units(line, size=120)
+    assert sentence in units
+    assert all(len(unit) <= 120 for unit in units)
+    assert all(not unit.startswith(" ") and not unit.endswith(" ") for unit in units)
+    assert " ".join(units).split() == line.split()
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("Line one.\n\nLine two.", size=800, overlap=150) == ["Line one.\nLine two."]
@@ -0,0 +1,73 @@
+# Report Streaming Tests
+# Feeds the incremental parser a writer-style JSON object in arbitrary chunks
+
+from report_streaming import FIELD, PARTIAL, ProgressiveReportFile, ReportStreamParser
+from typing import Any, Dict, List, Tuple
+import json
+import random
+import pytest
+
+REPORT = {
+    "title": "AI \"Careers\" \\ 2025",
+    "executive_summary": "Demand is high.\nSalaries rise\t10%.",
+    "key_findings": ["AI roles grew 30%", "Nested {braces}, [brackets] and \"quotes\""],
+    "detailed_report": "# Report\n\nUnicode: café, 😀, é, \\u escapes and a / slash.\n" * 20,
+    "recommendations": [],
+    "score": -1.5e3,
+    "verified": True,
+    "reviewer": None,
+    "meta": {"sources": ["https://example.com/a?b=1,2"], "depth": 2},
+}
+
+def split_randomly(text: str, rng: random.Random) -> List[str]:
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 12)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+def parse(chunks: List[str]) -> Tuple[ReportStreamParser, List[Tuple[str, str, Any]]]:
+    parser = ReportStreamParser()
+    events: List[Tuple[str, str, Any]] = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return parser, events
+
+@pytest.mark.parametrize("ensure_ascii", [False, True])
+@pytest.mark.parametrize("seed", range(25))
+def test_random_chunking_yields_every_field(seed, ensure_ascii):
+    text = json.dumps(REPORT, ensure_ascii=ensure_ascii, indent=seed % 2 or None)
+    parser, events = parse(split_randomly(text, random.Random(seed)))
+
+    fields: Dict[str, Any] = {key: value for kind, key, value in events if kind == FIELD}
+    assert fields == REPORT
+    assert [key for kind, key, _ in events if kind == FIELD] == list(REPORT)
+    assert parser.done
+
+def test_partial_text_reassembles_string_values():
+    parser, events = parse(split_randomly(json.dumps(REPORT), random.Random(7)))
+    partial = "".join(value for kind, key, value in events if kind == PARTIAL and key == "detailed_report")
+    assert partial == REPORT["detailed_report"]
+    assert not any(kind == PARTIAL and key == "key_findings" for kind, key, _ in events)
+
+def test_field_is_reported_before_the_object_ends():
+    parser = ReportStreamParser()
+    events = parser.feed('{"title": "Early", "key_findings": ["a", "b"], "detailed_report": "still go')
+    assert (FIELD, "title", "Early") in events
+    assert (FIELD, "key_findings", ["a", "b"]) in events
+    assert (PARTIAL, "detailed_report", "still go") in events
+    assert not parser.done
+
+def test_surrogate_pair_split_across_chunks():
+    parser, events = parse(['{"title": "\\ud83d', '\\ude00!"}'])
+    assert (FIELD, "title", "😀!") in events
+
+def test_progressive_file_writes_as_text_arrives(tmp_path):
+    path = tmp_path / "runs" / "abc" / "detailed_report.md"
+    report_file = ProgressiveReportFile(str(path))
+    report_file.write("# Title\n")
+    assert path.read_text(encoding="utf-8") == "# Title\n"
+    report_file.write("More")
+    report_file.close()
+    assert path.read_text(encoding="utf-8") == "# Title\nMore"